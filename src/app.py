@@ -1,8 +1,19 @@
+import json
 import uvicorn
 import urllib3
 from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
 from config.api import token_manager
-from config.task import start_scheduler, get_data_for_a_week
+from config.task import start_scheduler, get_data_for_a_week_async, stream_data_for_a_week, resync
+from database.db import close_all_pools, log_writer, get_pool_stats
+from database.metrics import db_metrics
+from database.schema import SCHEMA_BOOTSTRAP, bootstrap_schema, print_report
+from services.employee_directory import employee_directory
+from services.spool import record_spool
+from services.dss_client import dss_client, dss_breaker
+from services.dss_async import dss_async_client
+from services.watermark import watermarks
+from services.week_cache import week_cache, WEEK_CACHE_ENABLED
 
 app = FastAPI(
     title='API Dahua para obtener los registros de asistencias',
@@ -13,7 +24,7 @@ app = FastAPI(
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 @app.get('/', description='Endpoint default')
-def default_endpoint():
+async def default_endpoint():
     try:
         info = [
             { "message" : "Dahua Record Assistance API en ejecución ..." },
@@ -27,18 +38,84 @@ def default_endpoint():
         ]
         return info
     
+def _stream_records(records):
+    """Serializa los registros a medida que se leen del DSS (mismo formato que la respuesta completa)."""
+    count = 0
+    yield '{"code": 1000, "data": {"pageData": ['
+    try:
+        for record in records:
+            yield (', ' if count else '') + json.dumps(record.to_dict(), ensure_ascii=False)
+            count += 1
+    except Exception as e:
+        yield f'], "totalCount": {count}, "error": {json.dumps(str(e))}}}}}'
+        return
+    yield f'], "totalCount": {count}}}}}'
+
 @app.post('/obtener-registros-7-dias', description='Endpoint que obtiene las asistencias de todo el personal en un rango de 7 días')
-def get_records_7_days():
+async def get_records_7_days(stream: bool = False):
+    if stream:
+        return StreamingResponse(_stream_records(stream_data_for_a_week()), media_type='application/json')
     try:
-        resultado = get_data_for_a_week()
+        # Con el caché solo se pide al DSS el delta desde la última actualización
+        resultado = await week_cache.get() if WEEK_CACHE_ENABLED else await get_data_for_a_week_async()
+        # Los registros viajan como AccessRecord hasta aquí; el diccionario se genera solo en la respuesta
+        if resultado and "error" not in resultado:
+            resultado = {**resultado, "data": {**resultado["data"],
+                                               "pageData": [record.to_dict() for record in resultado["data"]["pageData"]]}}
         return resultado
     except Exception as e:
         return { "error" : str(e) }
 
+@app.get('/metricas/db', description='Endpoint que devuelve las métricas de latencia por consulta y el estado de los pools de conexiones')
+def get_db_metrics():
+    try:
+        metricas = db_metrics.snapshot()
+        metricas['pools'] = get_pool_stats()
+        metricas['logs'] = log_writer.stats()
+        metricas['spool'] = record_spool.stats()
+        metricas['week_cache'] = week_cache.stats()
+        return metricas
+    except Exception as e:
+        return { "error" : str(e) }
+
+@app.get('/metricas/dss', description='Endpoint que devuelve el estado del circuit breaker de las llamadas al DSS')
+def get_dss_metrics():
+    return dss_breaker.snapshot()
+
+@app.post('/metricas/db/reiniciar', description='Endpoint que reinicia las métricas de la base de datos')
+async def reset_db_metrics():
+    db_metrics.reset()
+    return { "status" : "ok" }
+
+@app.get('/sincronizacion', description='Endpoint que devuelve la marca de agua (último registro migrado) de cada tarea')
+def get_watermarks():
+    return watermarks.snapshot()
+
+@app.post('/sincronizacion/resincronizar', description='Endpoint que descarta la marca de agua para que el próximo ciclo consulte la ventana completa (job: iclock, acc_monitor_log o vacío para ambas)')
+def resync_watermarks(job: str = None):
+    if job and job not in ('iclock', 'acc_monitor_log'):
+        return { "error" : f"Tarea no válida: {job}" }
+    try:
+        return { "status" : "ok", "resincronizadas" : resync(job) }
+    except Exception as e:
+        return { "error" : str(e) }
+
 @app.on_event("startup")
 async def startup_event():
-    # Iniciar el scheduler cuando se levanta la API
+    # Verificar los índices (opcional), cargar el directorio de empleados e iniciar el scheduler cuando se levanta la API
+    if SCHEMA_BOOTSTRAP:
+        print_report(bootstrap_schema())
+    employee_directory.refresh(force=True)
     start_scheduler()
+    dss_async_client.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Escribir los logs pendientes y cerrar las conexiones del pool y del cliente DSS al detener la API
+    log_writer.stop()
+    close_all_pools()
+    dss_client.close()
+    await dss_async_client.close()
 
 if __name__ == "__main__":
     token_manager.start()
@@ -0,0 +1,100 @@
+"""
+Benchmark local de la migración con el motor SQLite, sin SQL Server ni DSS.
+
+Genera una página sintética de registros DSS, crea el esquema en archivos SQLite temporales
+y mide migrate_db_iclock, migrate_db_acc_manager_log y migrate_db_data_sj de extremo a extremo.
+
+Uso (desde la carpeta src):
+    python benchmark.py --records 7000 --employees 300 --mode row
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from services.access_record import AccessRecord
+from utils.alarm_time import local_to_epoch
+
+POINT_NAMES = ['B_Sistemas_Tics_Door1', 'B_Talento_Humano_Door1', 'B_Casilleros_Mujeres_Door1',
+               'B_Casilleros_Hombres_Door1', 'B_Comedor_MH_Door1', 'B_Comedor_A4_Door1',
+               'B_Casilleros_A4_Door1', 'B_Ventas_Door1', 'B_Contabilidad_Door1']
+
+
+def build_page(records, employees, hours):
+    """Página con el mismo formato que retorna fetch_access_control_records_page."""
+    now = datetime.now() - timedelta(hours=6)
+    start = now - timedelta(hours=hours)
+    step = (hours * 3600) / max(records, 1)
+    page = []
+    for i in range(records):
+        alarm_time = start + timedelta(seconds=int(i * step))
+        employee = random.randrange(employees)
+        page.append(AccessRecord(str(i + 1), str(1000 + employee), f'Empleado {employee}',
+                                 random.choice(POINT_NAMES), local_to_epoch(alarm_time.replace(microsecond=0))))
+    return {'code': 1000, 'data': {'pageData': page, 'totalCount': records}}
+
+
+def seed(db, employees):
+    now = datetime.now()
+    with db.get_db_connection(1) as conn:
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO Parametros_Sistema (id_grupo, prm_descripcion, prm_valor) VALUES (?, ?, ?)",
+                           [(14, 'num_hours_iclock', '24'), (14, 'num_hours_acc_monitor_log', '24'),
+                            (14, 'record_limit_dss', '7000'), (8, 'send_mail', 'D')])
+        conn.commit()
+    with db.get_db_connection(2) as conn:
+        cursor = conn.cursor()
+        cursor.executemany("INSERT INTO personnel_employee (emp_code, first_name, change_time) VALUES (?, ?, ?)",
+                           [(str(1000 + i), f'Empleado {i}', now) for i in range(employees)])
+        conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark local de la migración (SQLite)')
+    parser.add_argument('--records', type=int, default=7000)
+    parser.add_argument('--employees', type=int, default=300)
+    parser.add_argument('--hours', type=int, default=24)
+    parser.add_argument('--mode', choices=['row', 'staging'], default='row')
+    parser.add_argument('--indexes', action='store_true', help='Crear los índices de database.schema antes de medir')
+    parser.add_argument('--runs', type=int, default=2, help='La segunda ejecución mide el caso de todo duplicado')
+    args = parser.parse_args()
+
+    # La configuración se lee al importar los módulos, por eso se fija antes de importarlos
+    workdir = tempfile.mkdtemp(prefix='dahua_bench_')
+    os.environ['DB_BACKEND'] = 'sqlite'
+    os.environ['DB_SQLITE_PATH'] = os.path.join(workdir, 'dahua_{db_id}.sqlite3')
+    os.environ['DB_METRICS_ENABLED'] = '1'
+    os.environ['MIGRATION_MODE'] = args.mode
+
+    from database import db
+    from database.metrics import db_metrics
+    from services.migrate_db import migrate_db_iclock, migrate_db_acc_manager_log, migrate_db_data_sj
+
+    seed(db, args.employees)
+    if args.indexes:
+        from database.schema import ensure_indexes
+        ensure_indexes()
+    data = build_page(args.records, args.employees, args.hours)
+    print(f'Base SQLite en {workdir}; {args.records} registros, {args.employees} empleados, modo {args.mode}.')
+
+    for run in range(1, args.runs + 1):
+        for migrate in (migrate_db_iclock, migrate_db_acc_manager_log, migrate_db_data_sj):
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                migrate(data)
+            print(f'[ejecución {run}] {migrate.__name__}: {time.perf_counter() - start:.3f} s')
+
+    print('\nConsultas con mayor tiempo total:')
+    for query in db_metrics.snapshot()['queries'][:15]:
+        print(f"  {query['label']:<45} db={query['db_id']} {query['phase']:<8} "
+              f"n={query['count']:<6} total={query['total_seconds']:.4f} s p95={query['p95_seconds']} s")
+
+    db.log_writer.stop()
+    db.close_all_pools()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,11 @@
 import hashlib
-import requests
 import sched
 import time
 import threading
-from database.db import get_host_dss_query, get_port_dss_query, get_user_dss_query, get_password_dss_query, get_temp_dss_query, log_to_db
+from database.db import get_user_dss_query, get_password_dss_query, get_temp_dss_query, log_to_db
 from utils.mail import send_mail
 from fastapi import HTTPException
+from services.dss_client import dss_client
 
 class TokenManager:
     def __init__(self):
@@ -18,10 +18,9 @@ class TokenManager:
     def _first_authentication(self):
         """Realiza la autenticación inicial para obtener realm y randomKey."""
         try:
-            response = requests.post(
-                url=f'https://{get_host_dss_query()[0]}:{get_port_dss_query()[0]}/brms/api/v1.0/accounts/authorize',
-                json={'userName': get_user_dss_query()[0], "clientType": "WINPC_V2"},
-                verify=False
+            response = dss_client.post(
+                '/brms/api/v1.0/accounts/authorize',
+                json={'userName': get_user_dss_query()[0], "clientType": "WINPC_V2"}
             )
             if not response.text.strip():
                 print("Error en first_authentication: respuesta vacía")
@@ -57,10 +56,9 @@ class TokenManager:
             "userType": "0"
         }
         try:
-            resp = requests.post(
-                url=f'https://{get_host_dss_query()[0]}:{get_port_dss_query()[0]}/brms/api/v1.0/accounts/authorize',
-                json=data,
-                verify=False
+            resp = dss_client.post(
+                '/brms/api/v1.0/accounts/authorize',
+                json=data
             )
             if not resp.text.strip():
                 print("Error en second_authentication: respuesta vacía")
@@ -76,11 +74,10 @@ class TokenManager:
             if self.token:
                 headers = {'X-Subject-Token': self.token}
                 try:
-                    response = requests.put(
-                        url=f'https://{get_host_dss_query()[0]}:{get_port_dss_query()[0]}/brms/api/v1.0/accounts/keepalive',
+                    response = dss_client.put(
+                        '/brms/api/v1.0/accounts/keepalive',
                         headers=headers,
-                        data="{}",
-                        verify=False
+                        data="{}"
                     )
                     if response.status_code != 200:
                         self.token = None
@@ -115,11 +112,10 @@ class TokenManager:
             return
         try:
             headers = {'X-Subject-Token': self.token}
-            response = requests.put(
-                url=f'https://{get_host_dss_query()[0]}:{get_port_dss_query()[0]}/brms/api/v1.0/accounts/keepalive',
+            response = dss_client.put(
+                '/brms/api/v1.0/accounts/keepalive',
                 headers=headers,
-                data="{}",
-                verify=False
+                data="{}"
             )
             if response.status_code != 200:
                 print("Keepalive fallido:", response.status_code)
@@ -135,11 +131,10 @@ class TokenManager:
                 signature = self._get_signature_for_update_token(self.token)
                 headers = {'X-Subject-Token': self.token}
                 data = {"signature": signature}
-                response = requests.post(
-                    url=f'https://{get_host_dss_query()[0]}:{get_port_dss_query()[0]}/brms/api/v1.0/accounts/updateToken',
+                response = dss_client.post(
+                    '/brms/api/v1.0/accounts/updateToken',
                     headers=headers,
-                    json=data,
-                    verify=False
+                    json=data
                 )
                 if response.status_code == 200:
                     updated_token = response.json().get("data", {}).get("token")
@@ -6,8 +6,15 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from fastapi import HTTPException
 
-from services.dahua import fetch_access_control_records_page, get_global_token
-from services.migrate_db import migrate_db_iclock, migrate_db_acc_manager_log, migrate_db_data_sj
+from services.dahua import (fetch_access_control_records_page, fetch_all_access_control_records, stream_access_control_records,
+                            fetch_access_control_records_range,
+                            get_global_token, DSS_STREAMING)
+from services.migrate_db import migrate_db_iclock, migrate_db_acc_manager_log, migrate_db_data_sj, iter_chunks, SPOOLED
+from services.spool import replay_spool
+from services.dss_async import dss_async_client
+from services.dss_client import dss_breaker
+from services.retention import purge_logs_info, LOGS_RETENTION_INTERVAL
+from services.watermark import watermarks, HighMark, WATERMARK_ENABLED
 from database.db import get_time_validate_iclock_data, get_time_validate_acc_monitor_log_data, log_to_db, get_record_limit_iclock, get_record_limit_acc_monitor_log_query
 from utils.mail import send_mail
 
@@ -27,7 +34,8 @@ def run_iclock():
     except Exception as e:
         print(f"[run_iclock] error: {e}")
     finally:
-        scheduler.enter(ICLOCK_INTERVAL, 1, run_iclock)
+        # Con el circuito del DSS abierto se espera el enfriamiento en lugar de reintentar en bucle
+        scheduler.enter(max(ICLOCK_INTERVAL, dss_breaker.remaining()), 1, run_iclock)
 
 def run_acc_monitor_log():
     """
@@ -38,7 +46,18 @@ def run_acc_monitor_log():
     except Exception as e:
         print(f"[run_acc_monitor_log] error: {e}")
     finally:
-        scheduler.enter(ACC_MONITOR_INTERVAL, 1, run_acc_monitor_log)
+        scheduler.enter(max(ACC_MONITOR_INTERVAL, dss_breaker.remaining()), 1, run_acc_monitor_log)
+
+def run_logs_retention():
+    """
+    Depura Logs_Info en un hilo aparte (para no detener las migraciones) y se reprograma.
+    """
+    try:
+        threading.Thread(target=purge_logs_info, daemon=True).start()
+    except Exception as e:
+        print(f"[run_logs_retention] error: {e}")
+    finally:
+        scheduler.enter(LOGS_RETENTION_INTERVAL, 2, run_logs_retention)
 
 def get_data_from_dss():
     try:
@@ -62,19 +81,25 @@ def get_data_from_dss():
         log_to_db(2, 1, 'ERROR', message, 'get_data_from_dss', 404)
         return None
 
-def get_data_iclock():
+def get_data_iclock(stream=False):
     try:
         today = datetime.now()
         hours = int(get_time_validate_iclock_data()[0])
         startTime = int((today - timedelta(hours=hours)).timestamp())
+        if WATERMARK_ENABLED:
+            # Solo desde el último registro migrado (menos el solapamiento)
+            startTime = watermarks.start_time('iclock', startTime)
         endTime = int((today + timedelta(hours=1)).timestamp())
         record_limit = get_record_limit_iclock()[0]
-        resultado = fetch_access_control_records_page(
-            page='1',
-            pageSize=f'{record_limit}',
+        if stream:
+            # pageData es un generador: los registros se leen del DSS a medida que se migran
+            return {"data": {"pageData": stream_access_control_records(startTime, endTime, get_global_token(), record_limit)}}
+        # record_limit es el tamaño de página; las páginas siguientes se obtienen en paralelo
+        resultado = fetch_all_access_control_records(
             startTime=startTime,
             endTime=endTime,
-            token=get_global_token()
+            token=get_global_token(),
+            pageSize=record_limit
         )
         return resultado
     except Exception as e:
@@ -84,19 +109,25 @@ def get_data_iclock():
         log_to_db(2, 1, 'ERROR', message, 'get_data_iclock', 404)
         return None
 
-def get_data_acc_monitor_log():
+def get_data_acc_monitor_log(stream=False):
     try:
         today = datetime.now()
         hours = int(get_time_validate_acc_monitor_log_data()[0])
         startTime = int((today - timedelta(hours=hours)).timestamp())
+        if WATERMARK_ENABLED:
+            # Solo desde el último registro migrado (menos el solapamiento)
+            startTime = watermarks.start_time('acc_monitor_log', startTime)
         endTime = int((today + timedelta(hours=1)).timestamp())
         record_limit = get_record_limit_acc_monitor_log_query()[0]
-        resultado = fetch_access_control_records_page(
-            page='1',
-            pageSize=f'{record_limit}',
+        if stream:
+            # pageData es un generador: los registros se leen del DSS a medida que se migran
+            return {"data": {"pageData": stream_access_control_records(startTime, endTime, get_global_token(), record_limit)}}
+        # record_limit es el tamaño de página; las páginas siguientes se obtienen en paralelo
+        resultado = fetch_all_access_control_records(
             startTime=startTime,
             endTime=endTime,
-            token=get_global_token()
+            token=get_global_token(),
+            pageSize=record_limit
         )
         return resultado
     except Exception as e:
@@ -106,17 +137,25 @@ def get_data_acc_monitor_log():
         log_to_db(1, 1, 'ERROR', message, 'get_data_acc_monitor_log', 404)
         return None
 
+def stream_data_for_a_week():
+    """Generador de los registros de los últimos 7 días leídos en streaming (el token se pide al empezar a iterar)."""
+    today = datetime.now()
+    startTime = int((today - timedelta(days=7)).timestamp())
+    endTime = int((today + timedelta(hours=1)).timestamp())
+    # keep_raw: la API responde con todos los campos del DSS
+    yield from stream_access_control_records(startTime, endTime, get_global_token(), keep_raw=True)
+
 def get_data_for_a_week():
     try:
         today = datetime.now()
         startTime = int((today - timedelta(days=7)).timestamp())
         endTime = int((today + timedelta(hours=1)).timestamp())
-        resultado = fetch_access_control_records_page(
-            page='1',
-            pageSize='7000',
+        # Ventanas consultadas en paralelo en lugar de un solo rango de 7 días
+        resultado = fetch_access_control_records_range(
             startTime=startTime,
             endTime=endTime,
-            token=get_global_token()
+            token=get_global_token(),
+            keep_raw=True
         )
         return resultado
     except Exception as e:
@@ -125,6 +164,20 @@ def get_data_for_a_week():
         log_to_db(1, 1, 'ERROR', message, 'get_data_for_a_week', 404)
         return None
 
+async def get_data_for_a_week_async():
+    """Versión asíncrona de get_data_for_a_week (no bloquea un hilo durante la consulta al DSS)."""
+    try:
+        today = datetime.now()
+        startTime = int((today - timedelta(days=7)).timestamp())
+        endTime = int((today + timedelta(hours=1)).timestamp())
+        # Ventanas consultadas en paralelo sobre el event loop, igual que get_data_for_a_week
+        return await dss_async_client.fetch_records_range(startTime=startTime, endTime=endTime, keep_raw=True)
+    except Exception as e:
+        message = f'Error al obtener las asistencias semanal: {e}'
+        print(message)
+        log_to_db(1, 1, 'ERROR', message, 'get_data_for_a_week', 404)
+        return None
+
 def get_record_7_days():
     data = get_data_for_a_week()
     if data:
@@ -132,50 +185,110 @@ def get_record_7_days():
         return tamanho, data
     return None
 
+def _track_high_mark(data):
+    """Registra el mayor alarmTime de la respuesta; en streaming se observa a medida que se consume."""
+    high_mark = HighMark()
+    page_data = data["data"]["pageData"]
+    if isinstance(page_data, list):
+        for record in page_data:
+            high_mark.observe(record)
+    else:
+        data["data"]["pageData"] = high_mark.track(page_data)
+    return high_mark
+
+def _page_completed(result):
+    """Una página cuenta como completa si se migró o si quedó guardada en el spool local."""
+    return result is True or result == SPOOLED
+
+def _advance_watermark(job, data, high_mark, completed):
+    """
+    La marca avanza solo si el ciclo migró todo lo obtenido (sin errores ni páginas faltantes);
+    las páginas que quedaron en el spool cuentan como migradas porque el spool las reproduce.
+    """
+    if not WATERMARK_ENABLED:
+        return
+    if not completed or data["data"].get("missingPages"):
+        print(f'Ciclo {job} incompleto: la marca de agua no avanza.')
+        return
+    watermarks.advance(job, high_mark)
+
+def resync(job=None):
+    """Descarta la marca de agua (de una tarea o de todas) para que el próximo ciclo consulte la ventana completa."""
+    removed = watermarks.reset(job)
+    message = f'Resincronización solicitada para: {", ".join(removed) or "ninguna tarea con marca"}'
+    print(message)
+    return removed
+
 def iclock():
     """
     Obtiene datos ICLOCK y migra en paralelo hacia SJ y tabla principal.
     """
-    data = get_data_iclock()
-    if not data:
+    # Primero se reproducen los registros guardados en el spool local durante una caída de la base
+    replay_spool('iclock', migrate_db_iclock)
+    replay_spool('acc_monitor_log_sj', migrate_db_data_sj)
+
+    data = get_data_iclock(stream=DSS_STREAMING)
+    if not data or "error" in data:
         print("No hay datos de iclock")
         return
+    high_mark = _track_high_mark(data)
 
+    # En streaming el generador se consume una sola vez: cada bloque se migra a ambos destinos
+    pages = [data]
+    if DSS_STREAMING:
+        pages = ({"data": {"pageData": chunk}} for chunk in iter_chunks(data["data"]["pageData"]))
+
+    completed = True
     with ThreadPoolExecutor(max_workers=2) as executor:
-        futures = [
-            executor.submit(migrate_db_iclock, data),
-            executor.submit(migrate_db_data_sj, data),
-        ]
-        for f in as_completed(futures):
-            try:
-                f.result()
-            except Exception as e:
-                message = f"Error en migración iclock: {e}"
-                print(message)
-                log_to_db(2, 1, 'ERROR', message, 'iclock', 500)
-                send_mail(message)
+        try:
+            for page in pages:
+                futures = [
+                    executor.submit(migrate_db_iclock, page),
+                    executor.submit(migrate_db_data_sj, page),
+                ]
+                for f in as_completed(futures):
+                    try:
+                        if not _page_completed(f.result()):
+                            completed = False
+                    except Exception as e:
+                        completed = False
+                        message = f"Error en migración iclock: {e}"
+                        print(message)
+                        log_to_db(2, 1, 'ERROR', message, 'iclock', 500)
+                        send_mail(message)
+        except Exception as e:
+            # Error al leer el stream del DSS; los bloques previos ya quedaron migrados
+            completed = False
+            print(f"Error al leer los registros iclock: {e}")
+    _advance_watermark('iclock', data, high_mark, completed)
 
 def acc_monitor_log():
     """
     Obtiene y migra los logs de control de acceso.
     """
-    data = get_data_acc_monitor_log()
-    if not data:
+    replay_spool('acc_monitor_log', migrate_db_acc_manager_log)
+
+    data = get_data_acc_monitor_log(stream=DSS_STREAMING)
+    if not data or "error" in data:
         print("No hay datos de acc_monitor_log")
         return
+    high_mark = _track_high_mark(data)
 
+    completed = False
     try:
-        migrate_db_acc_manager_log(data)
+        completed = _page_completed(migrate_db_acc_manager_log(data))
     except Exception as e:
         message = f"Error en migración acc_monitor_log: {e}"
         print(message)
         log_to_db(1, 1, 'ERROR', message, 'acc_monitor_log', 500)
         send_mail(message)
+    _advance_watermark('acc_monitor_log', data, high_mark, completed)
 
 def start_scheduler():
     """
-    Inicia el scheduler programando ambas tareas en t=0.
+    Inicia el scheduler programando ambas tareas en t=0 y la depuración de Logs_Info.
     """
     scheduler.enter(0, 1, run_iclock)
     scheduler.enter(0, 1, run_acc_monitor_log)
+    scheduler.enter(LOGS_RETENTION_INTERVAL, 2, run_logs_retention)
     threading.Thread(target=scheduler.run, daemon=True).start()
\ No newline at end of file
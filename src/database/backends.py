@@ -0,0 +1,194 @@
+import os
+import re
+import sqlite3
+from datetime import date, datetime
+from functools import lru_cache
+
+# Motor de base de datos: 'mssql' (SQL Server por ODBC, por defecto) o 'sqlite' (pruebas y benchmarks locales)
+DB_BACKEND = os.getenv('DB_BACKEND', 'mssql')
+
+# Ruta de los archivos SQLite; {db_id} se reemplaza por el id de DB_CONFIG
+DB_SQLITE_PATH = os.getenv('DB_SQLITE_PATH', 'dahua_{db_id}.sqlite3')
+
+
+class SqlServerBackend:
+    """Conexiones pyodbc a SQL Server (ODBC Driver 17)."""
+
+    name = 'mssql'
+
+    def connect(self, db_id, db_name, server=None, read_only=False):
+        import pyodbc
+        return pyodbc.connect(
+            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
+            f"SERVER={server or os.getenv('DB_SERVER')};"
+            f"DATABASE={db_name};"
+            f"UID={os.getenv('DB_USERNAME')};"
+            f"PWD={os.getenv('DB_PASSWORD')};"
+            + ("ApplicationIntent=ReadOnly;" if read_only else ""),
+            timeout=5
+        )
+
+
+# Esquema equivalente para SQLite con las columnas que usa la API
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS iclock_transaction (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    emp_code VARCHAR(20), punch_time DATETIME, punch_state VARCHAR(5), verify_type INTEGER,
+    work_code VARCHAR(20), terminal_sn VARCHAR(50), terminal_alias VARCHAR(50), area_alias VARCHAR(120),
+    source INTEGER, purpose INTEGER, crc VARCHAR(100), upload_time DATETIME, emp_id INTEGER,
+    terminal_id INTEGER, is_mask INTEGER, temperature DECIMAL(4, 1), FechaBio DATE
+);
+CREATE TABLE IF NOT EXISTS iclock_transaction_sj (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    emp_code VARCHAR(20), punch_time DATETIME, punch_state VARCHAR(5), verify_type INTEGER,
+    work_code VARCHAR(20), terminal_sn VARCHAR(50), terminal_alias VARCHAR(50), area_alias VARCHAR(120),
+    source INTEGER, purpose INTEGER, crc VARCHAR(100), upload_time DATETIME, emp_id INTEGER,
+    terminal_id INTEGER, is_mask INTEGER, temperature DECIMAL(4, 1), FechaBio DATE
+);
+CREATE TABLE IF NOT EXISTS acc_monitor_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status INTEGER, time DATETIME, pin VARCHAR(30), device_id INTEGER, device_name VARCHAR(100),
+    verified INTEGER, state INTEGER, event_type INTEGER, event_point_type INTEGER,
+    event_point_id INTEGER, event_point_name VARCHAR(100)
+);
+CREATE TABLE IF NOT EXISTS acc_monitor_log_sj (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    status INTEGER, time DATETIME, pin VARCHAR(30), device_id INTEGER, device_name VARCHAR(100),
+    verified INTEGER, state INTEGER, event_type INTEGER, event_point_type INTEGER,
+    event_point_id INTEGER, event_point_name VARCHAR(100)
+);
+CREATE TABLE IF NOT EXISTS personnel_employee (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    create_time DATETIME, change_time DATETIME, status INTEGER, emp_code VARCHAR(20), first_name VARCHAR(100),
+    photo VARCHAR(200), self_password VARCHAR(128), dev_privilege INTEGER, acc_group VARCHAR(5),
+    acc_timezone VARCHAR(20), enroll_sn VARCHAR(20), update_time DATETIME, hire_date DATE,
+    verify_mode INTEGER, is_admin BOOLEAN, enable_att BOOLEAN, enable_overtime BOOLEAN,
+    enable_holiday BOOLEAN, deleted BOOLEAN, reserved INTEGER, del_tag INTEGER, app_status INTEGER,
+    app_role INTEGER, is_active BOOLEAN, department_id INTEGER, enable_payroll BOOLEAN
+);
+CREATE TABLE IF NOT EXISTS iclock_terminal (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sn VARCHAR(50), alias VARCHAR(50)
+);
+CREATE TABLE IF NOT EXISTS Parametros_Sistema (
+    id_grupo INTEGER, prm_descripcion VARCHAR(100), prm_valor VARCHAR(500)
+);
+CREATE TABLE IF NOT EXISTS Logs_Info (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    id_group INTEGER, log_time DATETIME, log_level VARCHAR(20), message TEXT,
+    endpoint VARCHAR(100), status_code INTEGER
+);
+"""
+
+# Adaptadores explícitos (los predeterminados de sqlite3 están obsoletos desde Python 3.12)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_converter('DATETIME', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('DATE', lambda value: date.fromisoformat(value.decode()))
+
+_DBO_PREFIX = re.compile(r'\[dbo\]\.|\bdbo\.', re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def _translate(query):
+    """Adapta la sintaxis T-SQL común de db.py a SQLite (prefijo de esquema dbo)."""
+    return _DBO_PREFIX.sub('', query)
+
+
+def _params(params):
+    # pyodbc acepta execute(sql, (a, b)), execute(sql, [a, b]), execute(sql, a, b) y execute(sql, a);
+    # con SQLite también se admiten parámetros con nombre (dict)
+    if len(params) == 1 and isinstance(params[0], (list, tuple, dict)):
+        return params[0]
+    return params
+
+
+class _SqliteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.fast_executemany = False   # Compatibilidad con pyodbc; sin efecto en SQLite
+
+    def execute(self, query, *params):
+        self._cursor.execute(_translate(query), _params(params))
+        return self
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(_translate(query), rows)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+class _SqliteConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self):
+        return _SqliteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+
+
+class SqliteBackend:
+    """Conexiones SQLite con el mismo esquema, para ejecutar y medir la migración sin SQL Server."""
+
+    name = 'sqlite'
+
+    def __init__(self, path=DB_SQLITE_PATH):
+        self.path = path
+        self._initialized = set()
+
+    def connect(self, db_id, db_name, server=None, read_only=False):
+        # La "réplica" es el mismo archivo con una conexión de solo lectura (query_only)
+        path = self.path.format(db_id=db_id, db_name=db_name)
+        conn = sqlite3.connect(path, timeout=30, check_same_thread=False, uri=path.startswith('file:'),
+                               detect_types=sqlite3.PARSE_DECLTYPES)
+        if path not in self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SQLITE_SCHEMA)
+            self._initialized.add(path)
+        if read_only:
+            conn.execute('PRAGMA query_only = ON')
+        return _SqliteConnection(conn)
+
+
+BACKENDS = {
+    'mssql': SqlServerBackend,
+    'sqlite': SqliteBackend,
+}
+
+_backend = None
+
+
+def get_backend():
+    """Retorna la instancia del motor configurado en DB_BACKEND."""
+    global _backend
+    if _backend is None:
+        if DB_BACKEND not in BACKENDS:
+            raise ValueError(f'Motor de base de datos no soportado: {DB_BACKEND}')
+        _backend = BACKENDS[DB_BACKEND]()
+    return _backend
@@ -0,0 +1,70 @@
+import threading
+import time
+
+
+class ConfigCache:
+    """
+    Caché en memoria de Parametros_Sistema indexada por (id_grupo, prm_descripcion).
+
+    Parámetros:
+      - load_rows (callable): Retorna las filas (id_grupo, prm_descripcion, prm_valor) o None si falla.
+      - load_version (callable): Retorna un checksum barato de la tabla o None si no está disponible.
+      - ttl (float): Segundos durante los cuales los valores se usan sin consultar la base.
+      - max_age (float): Segundos tras los cuales se recarga aunque el checksum no cambie.
+      - retry_after (float): Segundos de espera antes de reintentar una carga fallida.
+    """
+
+    def __init__(self, load_rows, load_version=None, ttl=60, max_age=3600, retry_after=5):
+        self._load_rows = load_rows
+        self._load_version = load_version
+        self.ttl = ttl
+        self.max_age = max_age
+        self.retry_after = retry_after
+        self._values = None
+        self._version = None
+        self._loaded_at = float('-inf')
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def _reload(self, version, now):
+        rows = self._load_rows()
+        if rows is None:
+            # Se conservan los valores anteriores (si los hay) y se reintenta más tarde
+            if self._values is None:
+                self._checked_at = now
+            else:
+                self._checked_at = now - self.ttl + self.retry_after
+            return
+        self._values = {(int(grupo), str(descripcion).strip()): valor for grupo, descripcion, valor in rows}
+        self._version = version
+        self._loaded_at = self._checked_at = now
+
+    def _refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._values is not None and now - self._checked_at < self.ttl:
+                return
+            if self._values is None and now - self._checked_at < self.retry_after:
+                return
+
+            version = self._load_version() if self._load_version else None
+            if (self._values is not None and version is not None and version == self._version
+                    and now - self._loaded_at < self.max_age):
+                # La tabla no cambió: se extiende la vigencia sin recargar
+                self._checked_at = now
+                return
+            self._reload(version, now)
+
+    def get(self, id_grupo, prm_descripcion):
+        """Retorna el prm_valor del parámetro, o None si no existe o no se pudo cargar."""
+        self._refresh()
+        values = self._values
+        if values is None:
+            return None
+        return values.get((id_grupo, prm_descripcion))
+
+    def invalidate(self):
+        """Fuerza la recarga en la próxima lectura."""
+        with self._lock:
+            self._checked_at = float('-inf')
+            self._loaded_at = float('-inf')
@@ -1,100 +1,194 @@
 import os
-import pyodbc
+import atexit
+import threading
 # from utils.mail import sendmail
+from contextlib import contextmanager
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from fastapi import HTTPException
+from database.backends import get_backend
+from database.pool import ConnectionPool
+from database.config_cache import ConfigCache
+from database.log_writer import LogWriter
+from database.unit_of_work import UnitOfWork
+from database.metrics import db_metrics
 
 load_dotenv()
 
 # Diccionario de configuraciones para múltiples bases de datos
+# "replica" (opcional): servidor de solo lectura (ApplicationIntent=ReadOnly) para los SELECT
 DB_CONFIG = {
-    1: {"name": f"{os.getenv('DB_NAME_1')}"},
-    2: {"name": f"{os.getenv('DB_NAME_2')}"},
+    1: {"name": f"{os.getenv('DB_NAME_1')}", "replica": os.getenv('DB_REPLICA_SERVER_1')},
+    2: {"name": f"{os.getenv('DB_NAME_2')}", "replica": os.getenv('DB_REPLICA_SERVER_2')},
 }
 
-def create_db_connection(db_id: int):
-    """Crea una conexión nueva a la base de datos especificada."""
+# Parámetros del pool de conexiones (uno por db_id)
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+DB_POOL_IDLE_TIMEOUT = float(os.getenv('DB_POOL_IDLE_TIMEOUT', '300'))      # Segundos
+DB_POOL_VALIDATE_AFTER = float(os.getenv('DB_POOL_VALIDATE_AFTER', '30'))   # Segundos
+DB_POOL_ACQUIRE_TIMEOUT = float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', '10')) # Segundos
+
+# Filas por bloque en las cargas masivas (tablas temporales del modo staging)
+DB_BULK_CHUNK_SIZE = int(os.getenv('DB_BULK_CHUNK_SIZE', '500'))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def create_db_connection(db_id: int, role='primary'):
+    """Crea una conexión nueva a la base de datos especificada ('primary' o 'replica')."""
     if db_id not in DB_CONFIG:
         raise ValueError(f"ID de base de datos no reconocido: {db_id}")
     
     try:
-        conn = pyodbc.connect(
-            f"DRIVER={{ODBC Driver 17 for SQL Server}};"
-            f"SERVER={os.getenv('DB_SERVER')};"
-            f"DATABASE={DB_CONFIG[db_id]['name']};"
-            f"UID={os.getenv('DB_USERNAME')};"
-            f"PWD={os.getenv('DB_PASSWORD')};",
-            timeout=5
-        )
+        if role == 'replica':
+            conn = get_backend().connect(db_id, DB_CONFIG[db_id]['name'], server=DB_CONFIG[db_id]['replica'], read_only=True)
+        else:
+            conn = get_backend().connect(db_id, DB_CONFIG[db_id]['name'])
         # print(f"[INFO] Conexión establecida con {DB_CONFIG[db_id]['name']}")
         return conn
     except Exception as e:
         print(f"[ERROR] Error al conectar con la base de datos {DB_CONFIG[db_id]['name']}: {e}")
         return None
 
+def has_replica(db_id: int):
+    """Indica si el db_id tiene configurada una réplica de solo lectura."""
+    return bool(DB_CONFIG.get(db_id, {}).get('replica'))
+
+def get_pool(db_id: int, role='primary') -> ConnectionPool:
+    """Devuelve (creándolo la primera vez) el pool de conexiones del db_id y rol."""
+    if role == 'replica' and not has_replica(db_id):
+        role = 'primary'
+    key = (db_id, role)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    if db_id not in DB_CONFIG:
+        raise ValueError(f"ID de base de datos no reconocido: {db_id}")
 
-def get_db_connection(db_id: int):
-    """Conexión reutilizable en endpoints de FastAPI (no persistente entre peticiones)."""
-    conn = create_db_connection(db_id)
-    if conn is None:
-        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                lambda: create_db_connection(db_id, role),
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                idle_timeout=DB_POOL_IDLE_TIMEOUT,
+                validate_after=DB_POOL_VALIDATE_AFTER,
+                acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+                name=DB_CONFIG[db_id]['name'] + (' (réplica)' if role == 'replica' else ''),
+                observe=lambda phase, seconds, error: db_metrics.observe(f'pool_{role}', db_id, phase, seconds, error)
+            )
+            _pools[key] = pool
+    pool.fill()
+    return pool
+
+def close_all_pools():
+    """Cierra todos los pools de conexiones (al apagar la API)."""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+def get_pool_stats():
+    """Estado de cada pool ('db_id/rol'): conexiones prestadas, inactivas y máximo."""
+    return {f'{db_id}/{role}': pool.stats() for (db_id, role), pool in list(_pools.items())}
+
+def _acquire(pool, db_id, label):
+    try:
+        with db_metrics.timer(label, db_id, 'acquire'):
+            return pool.acquire()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Error de conexión a la base de datos: " + str(e))
+
+@contextmanager
+def get_db_connection(db_id: int, label='pool', role='primary'):
+    """
+    Presta una conexión del pool del db_id y garantiza su devolución al salir del bloque.
+    Si el bloque lanza una excepción se hace rollback; si el rollback falla la conexión se descarta.
+    Con role='replica' se usa la réplica de solo lectura; si no responde se usa el primario.
+    """
+    pool = get_pool(db_id, role)
+    try:
+        conn = _acquire(pool, db_id, label)
+    except HTTPException as e:
+        if pool is get_pool(db_id):
+            raise
+        print(f'[WARN] Réplica de {DB_CONFIG[db_id]["name"]} no disponible, se lee del primario: {e.detail}')
+        pool = get_pool(db_id)
+        conn = _acquire(pool, db_id, label)
+
+    broken = False
+    try:
+        yield conn
+    except Exception:
+        try:
+            conn.rollback()
+        except Exception:
+            broken = True
+        raise
+    finally:
+        pool.release(conn, broken=broken)
 
+def ping_db(db_id: int):
+    """Verifica que la base primaria responda (SELECT 1 con una conexión del pool)."""
     try:
-        with conn.cursor() as cursor:
+        with get_db_connection(db_id, 'ping') as conn:
+            cursor = conn.cursor()
             cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+        return True
     except Exception as e:
-        conn.close()
-        raise HTTPException(status_code=500, detail="Error validando conexión: " + str(e))
-    
-    return conn
+        print(f'La base {DB_CONFIG[db_id]["name"]} no responde: {e}')
+        return False
 
-# Función para ejecutar SELECT   
-def execute_select_query(db_id, query):
+def _read_role(primary):
+    return 'primary' if primary else 'replica'
+
+# Función para ejecutar SELECT (en la réplica si existe; primary=True para leer lo recién escrito)
+def execute_select_query(db_id, query, label=None, primary=False):
+    label = label or db_metrics.label(query)
     try:
-        conn = get_db_connection(db_id)
-        if conn is None:
-            return {'error': f'Error al conectar con la base de datos {DB_CONFIG[db_id]["name"]}'}
-        
-        cursor = conn.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        cursor.close()
-        return rows[0] if rows else None
+        with get_db_connection(db_id, label, _read_role(primary)) as conn:
+            cursor = conn.cursor()
+            with db_metrics.timer(label, db_id, 'query'):
+                cursor.execute(query)
+                rows = cursor.fetchall()
+            cursor.close()
+            return rows[0] if rows else None
     except Exception as e:
         message = f'Error al ejecutar SELECT en {DB_CONFIG[db_id]["name"]}: {e}'
         print(message)
         # log_to_db(db_id, 1, 'ERROR', message, 'execute_select_query', 400)
         return None
     
-def execute_select_tuple_query(db_id, query, tuple: tuple):
+def execute_select_tuple_query(db_id, query, tuple: tuple, label=None, primary=False):
+    label = label or db_metrics.label(query)
     try:
-        conn = get_db_connection(db_id)
-        if conn is None:
-            return {'error': f'Error al conectar con la base de datos {DB_CONFIG[db_id]["name"]}'}
-        
-        cursor = conn.cursor()
-        cursor.execute(query, tuple)
-        rows = cursor.fetchall()
-        cursor.close()
-        return rows
+        with get_db_connection(db_id, label, _read_role(primary)) as conn:
+            cursor = conn.cursor()
+            with db_metrics.timer(label, db_id, 'query'):
+                cursor.execute(query, tuple)
+                rows = cursor.fetchall()
+            cursor.close()
+            return rows
     except Exception as e:
         message = f'Error al ejecutar SELECT con tupla en {DB_CONFIG[db_id]["name"]}: {e}'
         print(message)
         # log_to_db(db_id, 1, 'ERROR', message, 'execute_select_tuple_query', 400)
         return None
     
-def execute_select_multiples_rows_query(db_id, query):
+def execute_select_multiples_rows_query(db_id, query, label=None, primary=False):
+    label = label or db_metrics.label(query)
     try:
-        conn = get_db_connection(db_id)
-        if conn is None:
-            print(f'Error al conectar con la base de datos {DB_CONFIG[db_id]["name"]}')
-            return []
-        
-        cursor = conn.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        cursor.close()
+        with get_db_connection(db_id, label, _read_role(primary)) as conn:
+            cursor = conn.cursor()
+            with db_metrics.timer(label, db_id, 'query'):
+                cursor.execute(query)
+                rows = cursor.fetchall()
+            cursor.close()
         # Si rows no es una lista (por ejemplo, un único registro), lo envolvemos en una lista.
         if rows and not isinstance(rows, list):
             rows = [rows]
@@ -106,36 +200,61 @@ def execute_select_multiples_rows_query(db_id, query):
         return []
 
 # 🔹 Función para ejecutar INSERT
-def execute_insert_query(db_id, query, params):
+def execute_insert_query(db_id, query, params, label=None):
+    label = label or db_metrics.label(query)
     try:
-        conn = get_db_connection(db_id)
-        if conn is None:
-            return {'error': f'Error al conectar con la base de datos {DB_CONFIG[db_id]["name"]}'}
-        
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
+        with get_db_connection(db_id, label) as conn:
+            cursor = conn.cursor()
+            with db_metrics.timer(label, db_id, 'query'):
+                cursor.execute(query, params)
+            with db_metrics.timer(label, db_id, 'commit'):
+                conn.commit()
+            cursor.close()
         return {'message': 'INSERT ejecutado correctamente'}
     except Exception as e:
         message = f'Error al ejecutar INSERT en {DB_CONFIG[db_id]["name"]}: {e}'
         print(message)
         # log_to_db(db_id, 1, 'ERROR', message, 'execute_insert_query', 409)
         return None
-    finally:
-        if conn:
-            conn.close()
+
+# Sentencias por commit dentro de una unidad de trabajo
+DB_UNIT_OF_WORK_BATCH_SIZE = int(os.getenv('DB_UNIT_OF_WORK_BATCH_SIZE', '1000'))
+
+# 🔹 Unidad de trabajo: varias escrituras en una sola conexión y un commit por sub-lote
+@contextmanager
+def unit_of_work(db_id: int, batch_size=None):
+    """
+    Abre una unidad de trabajo sobre una conexión del pool del db_id.
+
+    Uso:
+        with unit_of_work(2) as uow:
+            uow.add(insert_iclock_query, row)
+            uow.add(update_employee_by_id_query, (first_name, emp_code), on_commit=callback)
+
+    Las sentencias pendientes se confirman al salir del bloque (o cada batch_size sentencias).
+    Si el bloque lanza una excepción, las sentencias aún no confirmadas se descartan.
+    """
+    with get_db_connection(db_id, 'unit_of_work') as conn:
+        uow = UnitOfWork(
+            conn,
+            batch_size=batch_size or DB_UNIT_OF_WORK_BATCH_SIZE,
+            name=DB_CONFIG[db_id]['name'],
+            timer=lambda query, phase: db_metrics.timer(db_metrics.label(query), db_id, phase),
+        )
+        yield uow
+        uow.flush()
 
 # Función para ejecutar UPDATE
-def execute_update_query(db_id, query, params: tuple):
+def execute_update_query(db_id, query, params: tuple, label=None):
+    label = label or db_metrics.label(query)
     try:
-        conn = get_db_connection(db_id)
-        if conn is None:
-            return {'error': f'Error al conectar con la base de datos {DB_CONFIG[db_id]["name"]}'}
-        
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
-        cursor.close()
+        with get_db_connection(db_id, label) as conn:
+            cursor = conn.cursor()
+            with db_metrics.timer(label, db_id, 'query'):
+                cursor.execute(query, params)
+            with db_metrics.timer(label, db_id, 'commit'):
+                conn.commit()
+            cursor.close()
         return {'message': 'UPDATE ejecutado correctamente'}
     except Exception as e:
         message = f'Error al ejecutar UPDATE en {DB_CONFIG[db_id]["name"]}: {e}'
@@ -143,25 +262,53 @@ def execute_update_query(db_id, query, params: tuple):
         # log_to_db(db_id, 1, 'ERROR', message, 'execute_update_query', 400)
         return None
 
-# 🔹 Función para registrar logs en la base de datos
+# 🔹 Logs en la base de datos: log_to_db encola y un hilo inserta en bloque en Logs_Info
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+LOG_BATCH_SIZE = int(os.getenv('LOG_BATCH_SIZE', '200'))
+LOG_FLUSH_INTERVAL = float(os.getenv('LOG_FLUSH_INTERVAL', '2'))  # Segundos
+
+# 6 parámetros por fila; 300 filas quedan por debajo del límite de 2100 parámetros de SQL Server
+LOG_ROWS_PER_INSERT = 300
+
+insert_logs_info_query = """INSERT INTO Logs_Info (id_group, log_time, log_level, message, endpoint, status_code) VALUES {values}"""
+
+def _write_logs(db_id, rows):
+    """Inserta las filas con un INSERT multi-fila por cada LOG_ROWS_PER_INSERT; retorna cuántas quedaron escritas."""
+    written = 0
+    for start in range(0, len(rows), LOG_ROWS_PER_INSERT):
+        chunk = rows[start:start + LOG_ROWS_PER_INSERT]
+        query = insert_logs_info_query.format(values=', '.join(['(?, ?, ?, ?, ?, ?)'] * len(chunk)))
+        params = [value for row in chunk for value in row]
+        if execute_insert_query(db_id, query, params, label='insert_logs_info_query') is not None:
+            written += len(chunk)
+    return written
+
+log_writer = LogWriter(_write_logs, max_queue=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE,
+                       flush_interval=LOG_FLUSH_INTERVAL)
+atexit.register(log_writer.stop)
+
 def log_to_db(db_id, id_group, log_level, message, endpoint, status_code):
     log_time = datetime.now() - timedelta(hours=6)
-    query = """INSERT INTO Logs_Info (id_group, log_time, log_level, message, endpoint, status_code) VALUES (?, ?, ?, ?, ?, ?)"""
-    return execute_insert_query(db_id, query, (id_group, log_time, log_level, message, endpoint, status_code))
+    if log_writer.enqueue(db_id, (id_group, log_time, log_level, str(message), endpoint, status_code)):
+        return {'message': 'Log encolado correctamente'}
+    return None
+
+# Consulta de conteo (time, pin) sobre una conexión del pool
+def _exists_log(db_id, query, time, pin):
+    label = db_metrics.label(query)
+    with get_db_connection(db_id, label) as conn:
+        cursor = conn.cursor()
+        with db_metrics.timer(label, db_id, 'query'):
+            cursor.execute(query, (time, pin))
+            count = cursor.fetchone()[0]
+        cursor.close()
+    return count > 0
 
 # 🔹 Función para validar logs en acc_monitor_log
 def validate_log_acc_monitor_log(db_id, time, pin):
     query = """SELECT COUNT(*) FROM acc_monitor_log WHERE time = ? AND pin = ?"""
     try:
-        conn = get_db_connection(db_id)
-        if conn is None:
-            return {'error': f'Error al conectar con la base de datos {DB_CONFIG[db_id]["name"]}'}
-        
-        cursor = conn.cursor()
-        cursor.execute(query, (time, pin))
-        count = cursor.fetchone()[0]
-        cursor.close()
-        return count > 0
+        return _exists_log(db_id, query, time, pin)
     except Exception as e:
         print(f'Error al validar log en {DB_CONFIG[db_id]["name"]}: {e}')
         return None
@@ -170,15 +317,7 @@ def validate_log_acc_monitor_log(db_id, time, pin):
 def validate_log_iclock(db_id, time, pin):
     query = """SELECT COUNT(*) FROM iclock_transaction WHERE punch_time = ? AND emp_code = ?""" # '2025-02-25T07:02:27.000'
     try:
-        conn = get_db_connection(db_id)
-        if conn is None:
-            return {'error': f'Error al conectar con la base de datos {DB_CONFIG[db_id]["name"]}'}
-        
-        cursor = conn.cursor()
-        cursor.execute(query, (time, pin))
-        count = cursor.fetchone()[0]
-        cursor.close()
-        return count > 0
+        return _exists_log(db_id, query, time, pin)
     except Exception as e:
         print(f'Error al validar iclock en {DB_CONFIG[db_id]["name"]}: {e}')
         return None
@@ -186,15 +325,7 @@ def validate_log_iclock(db_id, time, pin):
 def validate_log_iclock_sj(db_id, time, pin):
     query = """SELECT COUNT(*) FROM iclock_transaction_sj WHERE punch_time = ? AND emp_code = ?"""
     try:
-        conn = get_db_connection(db_id)
-        if conn is None:
-            return {'error': f'Error al conectar con la base de datos {DB_CONFIG[db_id]["name"]}'}
-        
-        cursor = conn.cursor()
-        cursor.execute(query, (time, pin))
-        count = cursor.fetchone()[0]
-        cursor.close()
-        return count > 0
+        return _exists_log(db_id, query, time, pin)
     except Exception as e:
         print(f'Error al validar iclock en {DB_CONFIG[db_id]["name"]}: {e}')
         return None
@@ -202,43 +333,40 @@ def validate_log_iclock_sj(db_id, time, pin):
 def validate_log_acc_monitor_log_sj(db_id, time, pin):
     query = """SELECT COUNT(*) FROM acc_monitor_log_sj WHERE time = ? AND pin = ?"""
     try:
-        conn = get_db_connection(db_id)
-        if conn is None:
-            return {'error': f'Error al conectar con la base de datos {DB_CONFIG[db_id]["name"]}'}
-        
-        cursor = conn.cursor()
-        cursor.execute(query, (time, pin))
-        count = cursor.fetchone()[0]
-        cursor.close()
-        return count > 0
+        return _exists_log(db_id, query, time, pin)
     except Exception as e:
         print(f'Error al validar log en {DB_CONFIG[db_id]["name"]}: {e}')
         return None
 
-# Querys para obtener las credenciales de la base de datos DSS
-host_dss_query = """SELECT prm_valor
-                    FROM Parametros_Sistema
-                        WHERE id_grupo = 1 AND prm_descripcion = 'host'"""
-                        
-port_dss_query = """SELECT prm_valor
-                    FROM Parametros_Sistema
-                    WHERE id_grupo = 1 AND prm_descripcion = 'port'"""
-                    
-user_dss_query = """SELECT prm_valor
-                    FROM Parametros_Sistema
-                    WHERE id_grupo = 1 AND prm_descripcion = 'user'"""
-                    
-password_dss_query = """SELECT prm_valor
-                    FROM Parametros_Sistema
-                    WHERE id_grupo = 1 AND prm_descripcion = 'password'"""
-                    
-enpoint_access_record_dss_query = """SELECT prm_valor
-                                    FROM Parametros_Sistema
-                                    WHERE id_grupo = 6 AND prm_descripcion = 'enpoint_access_record'"""
-
-temp_dss_query = """SELECT prm_valor
-                    FROM Parametros_Sistema
-                    WHERE id_grupo = 1 AND prm_descripcion = 'temp'"""
+# Caché de Parametros_Sistema: una sola consulta carga todos los parámetros y se
+# refresca cada CONFIG_CACHE_TTL segundos solo si cambió el checksum de la tabla
+CONFIG_CACHE_TTL = float(os.getenv('CONFIG_CACHE_TTL', '60'))           # Segundos
+CONFIG_CACHE_MAX_AGE = float(os.getenv('CONFIG_CACHE_MAX_AGE', '3600')) # Segundos
+
+parametros_sistema_query = """SELECT id_grupo, prm_descripcion, prm_valor FROM dbo.Parametros_Sistema"""
+
+parametros_sistema_version_query = """SELECT CHECKSUM_AGG(BINARY_CHECKSUM(id_grupo, prm_descripcion, prm_valor))
+                FROM dbo.Parametros_Sistema"""
+
+def _load_parametros_sistema():
+    rows = execute_select_tuple_query(1, parametros_sistema_query, ())
+    if rows is None:
+        print('No se pudo cargar Parametros_Sistema; se mantienen los valores en caché.')
+    return rows
+
+def _load_parametros_sistema_version():
+    if get_backend().name != 'mssql':
+        return None  # Sin checksum: se recarga la tabla completa al vencer el TTL
+    row = execute_select_query(1, parametros_sistema_version_query)
+    return row[0] if row else None
+
+parametros_cache = ConfigCache(_load_parametros_sistema, _load_parametros_sistema_version,
+                               ttl=CONFIG_CACHE_TTL, max_age=CONFIG_CACHE_MAX_AGE)
+
+def get_parametro(id_grupo, prm_descripcion):
+    """Retorna el parámetro como tupla (prm_valor,), igual que execute_select_query, o None si no existe."""
+    value = parametros_cache.get(id_grupo, prm_descripcion)
+    return None if value is None else (value,)
 
 # Querys para insertar y validar informacion en la base de datos
 validate_log_query = """SELECT COUNT(*)
@@ -296,83 +424,50 @@ insert_acc_monitor_log_sj_query = """INSERT INTO [dbo].[acc_monitor_log_sj]
     [event_point_name]) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
 """
 
-# Querys para obtener la información de Correo Electronico
-server_mail_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 8 AND prm_descripcion = 'server'"""
-
-port_mail_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 8 AND prm_descripcion = 'port'"""
-
-endpoint_mail_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 8 AND prm_descripcion = 'mail_endpoint'"""
-
-user_mail_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 8 AND prm_descripcion = 'user_login_mail'"""
-
-password_mail_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 8 AND prm_descripcion = 'user_password_mail'"""
-                
 # Horas para validar y migrar la data para las tablas iclock y acc_monitor_log
-time_validate_iclock_data_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 14 AND prm_descripcion = 'num_hours_iclock'"""
-
-time_validate_acc_monitor_log_data_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 14 AND prm_descripcion = 'num_hours_acc_monitor_log'"""
-
-time_validate_acc_monitor_log_sj_data_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 14 AND prm_descripcion = 'num_hours_sj_acc_monitor_log'"""
-
 def get_time_validate_iclock_data():
-    return execute_select_query(1, time_validate_iclock_data_query)
+    return get_parametro(14, 'num_hours_iclock')
 
 def get_time_validate_acc_monitor_log_data():
-    return execute_select_query(1, time_validate_acc_monitor_log_data_query)
+    return get_parametro(14, 'num_hours_acc_monitor_log')
 
 def get_time_validate_acc_monitor_log_sj_data():
-    return execute_select_query(1, time_validate_acc_monitor_log_sj_data_query)
+    return get_parametro(14, 'num_hours_sj_acc_monitor_log')
 
 # Correo Electronico
 def get_port_mail():
-    return execute_select_query(1, port_mail_query)
+    return get_parametro(8, 'port')
 
 def get_server_mail():
-    return execute_select_query(1, server_mail_query)
+    return get_parametro(8, 'server')
 
 def get_user_mail():
-    return execute_select_query(1, user_mail_query)
+    return get_parametro(8, 'user_login_mail')
 
 def get_pass_mail():
-    return execute_select_query(1, password_mail_query)
+    return get_parametro(8, 'user_password_mail')
 
 def get_user_endpoint():
-    return execute_select_query(1, endpoint_mail_query)
+    return get_parametro(8, 'mail_endpoint')
 
 # Función para obtener los parametros DSS
 def get_host_dss_query():
-    return execute_select_query(1, host_dss_query)
+    return get_parametro(1, 'host')
 
 def get_port_dss_query():
-    return execute_select_query(1, port_dss_query)
+    return get_parametro(1, 'port')
 
 def get_user_dss_query():
-    return execute_select_query(1, user_dss_query)
+    return get_parametro(1, 'user')
 
 def get_password_dss_query():
-    return execute_select_query(1, password_dss_query)
+    return get_parametro(1, 'password')
 
 def get_enpoint_access_record_dss_query():
-    return execute_select_query(1, enpoint_access_record_dss_query)
+    return get_parametro(6, 'enpoint_access_record')
 
 def get_temp_dss_query():
-    return execute_select_query(1, temp_dss_query)
+    return get_parametro(1, 'temp')
 
 # Función para registrar logs en la base de datos
 def insert_iclock(data: tuple):
@@ -409,6 +504,98 @@ def get_last_log_time_iclock_sj(person_id):
 def get_last_log_time_acc_monitor_log_sj(person_id):
     return execute_select_tuple_query(1, time_max_time_acc_monitor_log_sj_query, (person_id,))
 
+# Validación de duplicados por página: una sola consulta por rango de tiempo
+
+existing_keys_iclock_query = """SELECT [emp_code], [punch_time] FROM [dbo].[iclock_transaction] WHERE [punch_time] BETWEEN ? AND ?"""
+
+existing_keys_acc_monitor_log_query = """SELECT [pin], [time] FROM [dbo].[acc_monitor_log] WHERE [time] BETWEEN ? AND ?"""
+
+existing_keys_iclock_sj_query = """SELECT [emp_code], [punch_time] FROM [dbo].[iclock_transaction_sj] WHERE [punch_time] BETWEEN ? AND ?"""
+
+existing_keys_acc_monitor_log_sj_query = """SELECT [pin], [time] FROM [dbo].[acc_monitor_log_sj] WHERE [time] BETWEEN ? AND ?"""
+
+def to_datetime(value):
+    """Normaliza un valor de fecha leído de la base (datetime o cadena) a datetime."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+def _get_existing_keys(db_id, query, keys):
+    """
+    Lee con una sola consulta todas las claves (pin, time) de la tabla dentro de la
+    ventana min/max de keys y retorna el subconjunto de keys que ya existe.
+    Retorna None si la consulta falla.
+    """
+    keys = {(str(pin), time) for pin, time in keys if time is not None}
+    if not keys:
+        return set()
+
+    times = [time for _, time in keys]
+    # Siempre del primario: debe ver lo que confirmaron los ciclos (y bloques) anteriores; una réplica atrasada duplicaría filas
+    rows = execute_select_tuple_query(db_id, query, (min(times), max(times)), primary=True)
+    if rows is None:
+        return None
+    existing = {(str(pin), to_datetime(time)) for pin, time in rows}
+    return existing & keys
+
+def get_existing_keys_iclock(keys):
+    return _get_existing_keys(2, existing_keys_iclock_query, keys)
+
+def get_existing_keys_acc_monitor_log(keys):
+    return _get_existing_keys(1, existing_keys_acc_monitor_log_query, keys)
+
+def get_existing_keys_iclock_sj(keys):
+    return _get_existing_keys(2, existing_keys_iclock_sj_query, keys)
+
+def get_existing_keys_acc_monitor_log_sj(keys):
+    return _get_existing_keys(1, existing_keys_acc_monitor_log_sj_query, keys)
+
+# Último registro por empleado para toda la página: una consulta agrupada por bloque de pines
+
+last_times_iclock_query = """SELECT [emp_code], MAX([punch_time]) FROM [dbo].[iclock_transaction] WHERE [emp_code] IN ({placeholders}) GROUP BY [emp_code]"""
+
+last_times_acc_monitor_log_query = """SELECT [pin], MAX([time]) FROM [dbo].[acc_monitor_log] WHERE [pin] IN ({placeholders}) GROUP BY [pin]"""
+
+last_times_iclock_sj_query = """SELECT [emp_code], MAX([punch_time]) FROM [dbo].[iclock_transaction_sj] WHERE [emp_code] IN ({placeholders}) GROUP BY [emp_code]"""
+
+last_times_acc_monitor_log_sj_query = """SELECT [pin], MAX([time]) FROM [dbo].[acc_monitor_log_sj] WHERE [pin] IN ({placeholders}) GROUP BY [pin]"""
+
+# SQL Server admite como máximo 2100 parámetros por sentencia
+DB_MAX_IN_PARAMS = 1000
+
+def _get_last_log_times(db_id, query, pins):
+    """
+    Retorna un diccionario {pin: último time registrado} para los pines dados,
+    con una consulta agrupada por cada bloque de DB_MAX_IN_PARAMS pines.
+    Los pines sin registros no aparecen en el diccionario. Retorna None si una consulta falla.
+    """
+    pins = sorted({str(pin) for pin in pins if pin is not None})
+    label = db_metrics.label(query)
+    last_times = {}
+    for start in range(0, len(pins), DB_MAX_IN_PARAMS):
+        chunk = pins[start:start + DB_MAX_IN_PARAMS]
+        # Del primario, igual que la validación de duplicados (regla de 30 minutos sobre lo recién escrito)
+        rows = execute_select_tuple_query(db_id, query.format(placeholders=', '.join('?' * len(chunk))), tuple(chunk), label=label,
+                                          primary=True)
+        if rows is None:
+            return None
+        for pin, last_time in rows:
+            if last_time is not None:
+                last_times[str(pin)] = to_datetime(last_time)
+    return last_times
+
+def get_last_log_times_iclock(pins):
+    return _get_last_log_times(2, last_times_iclock_query, pins)
+
+def get_last_log_times_acc_monitor_log(pins):
+    return _get_last_log_times(1, last_times_acc_monitor_log_query, pins)
+
+def get_last_log_times_iclock_sj(pins):
+    return _get_last_log_times(2, last_times_iclock_sj_query, pins)
+
+def get_last_log_times_acc_monitor_log_sj(pins):
+    return _get_last_log_times(1, last_times_acc_monitor_log_sj_query, pins)
+
 # Validar serial_number Biometricos
 sn_alias_query = """SELECT sn, alias FROM iclock_terminal"""
 
@@ -430,12 +617,8 @@ def get_emp_id_db(emp_code):
     return execute_select_tuple_query(2, emp_id_query, emp_code)
 
 # Activar opcion de enviar correo
-send_mail_status_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 8 AND prm_descripcion = 'send_mail'"""
-
 def get_send_mail_status():
-    return execute_select_query(1, send_mail_status_query)
+    return get_parametro(8, 'send_mail')
 
 # Validacion de empleados
 
@@ -480,41 +663,39 @@ def get_employee_by_id(emp_code):
 def get_update_employee(firstName, emp_code):
     return execute_update_query(2, update_employee_by_id_query, (firstName, emp_code))
 
-# Rango de tiempo para enviar el correo electronico establacido desde las 6am hasta las 8pm
+# Directorio de empleados en memoria: carga completa e incremental por change_time
+
+employee_directory_query = """SELECT emp_code, id, first_name, change_time FROM personnel_employee"""
+
+employee_directory_changed_query = """SELECT emp_code, id, first_name, change_time FROM personnel_employee WHERE change_time >= ?"""
 
-time_start_range_mail_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 8 AND prm_descripcion = 'start_time_send_mail_range'"""
+employee_directory_by_code_query = """SELECT emp_code, id, first_name, change_time FROM personnel_employee WHERE emp_code = ?"""
 
-time_end_range_mail_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 8 AND prm_descripcion = 'end_time_send_mail_range'"""
+def get_employees_db():
+    return execute_select_tuple_query(2, employee_directory_query, ())
 
+def get_employees_changed_db(since):
+    return execute_select_tuple_query(2, employee_directory_changed_query, (since,))
+
+def get_employee_directory_row_db(emp_code):
+    return execute_select_tuple_query(2, employee_directory_by_code_query, (emp_code,))
+
+# Rango de tiempo para enviar el correo electronico establacido desde las 6am hasta las 8pm
 def get_time_start_range_mail():
-    return execute_select_query(1, time_start_range_mail_query)
+    return get_parametro(8, 'start_time_send_mail_range')
 
 def get_time_end_range_mail():
-    return execute_select_query(1, time_end_range_mail_query)
+    return get_parametro(8, 'end_time_send_mail_range')
 
 # Numero de registros que se obtendran de DSS en la función get_data_iclock y get_data_acc_monitor_log
-
-record_limit_iclock_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 14 AND prm_descripcion = 'record_limit_dss'"""
-
 def get_record_limit_iclock():
-    return execute_select_query(1, record_limit_iclock_query)
-
-record_limit_acc_monitor_log_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 14 AND prm_descripcion = 'record_limit_acc_monitor_log'"""
+    return get_parametro(14, 'record_limit_dss')
 
 def get_record_limit_acc_monitor_log_query():
-    return execute_select_query(1, record_limit_acc_monitor_log_query)
-
-record_limit_acc_monitor_log_sj_query = """SELECT prm_valor
-                FROM dbo.Parametros_Sistema
-                WHERE id_grupo = 14 AND prm_descripcion = 'record_limit_sj_acc_monitor_log'"""
+    return get_parametro(14, 'record_limit_acc_monitor_log')
 
 def get_record_limit_acc_monitor_log_sj():
-    return execute_select_query(1, record_limit_acc_monitor_log_sj_query)
\ No newline at end of file
+    return get_parametro(14, 'record_limit_sj_acc_monitor_log')
+
+# Etiquetas de las métricas: nombre de la variable de cada consulta de este módulo
+db_metrics.register_queries(globals())
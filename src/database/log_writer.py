@@ -0,0 +1,112 @@
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+
+class LogWriter:
+    """
+    Escritor asíncrono de Logs_Info: log_to_db encola las filas y un hilo las inserta en bloque.
+
+    Parámetros:
+      - write_rows (callable): write_rows(db_id, rows) inserta una lista de filas
+        (id_group, log_time, log_level, message, endpoint, status_code) y retorna cuántas quedaron escritas.
+      - max_queue (int): Tamaño máximo de la cola; si está llena el log se descarta y se contabiliza.
+      - batch_size (int): Filas máximas por escritura.
+      - flush_interval (float): Segundos máximos que una fila espera en la cola.
+    """
+
+    def __init__(self, write_rows, max_queue=10000, batch_size=200, flush_interval=2.0):
+        self._write_rows = write_rows
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._dropped = Counter()
+        self._dropped_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        if self._thread is not None or self._stop.is_set():
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+                self._thread.start()
+
+    def enqueue(self, db_id, row):
+        """Encola una fila; si la cola está llena la descarta y la suma al resumen de descartes."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((db_id, row))
+            return True
+        except queue.Full:
+            # Se agrupan los descartes por (db_id, endpoint, log_level) para registrar un único resumen
+            with self._dropped_lock:
+                self._dropped[(db_id, row[4], row[2])] += 1
+            return False
+
+    def _collect(self):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval))
+        except queue.Empty:
+            return batch
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stop.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _dropped_summary(self):
+        with self._dropped_lock:
+            dropped, self._dropped = self._dropped, Counter()
+        log_time = datetime.now() - timedelta(hours=6)
+        return [(db_id, (1, log_time, 'WARNING', f'{count} logs "{log_level}" descartados por cola llena', endpoint, 503))
+                for (db_id, endpoint, log_level), count in dropped.items()]
+
+    def _write(self, batch):
+        batch = batch + self._dropped_summary()
+        by_db = defaultdict(list)
+        for db_id, row in batch:
+            by_db[db_id].append(row)
+        for db_id, rows in by_db.items():
+            try:
+                written = self._write_rows(db_id, rows)
+            except Exception as e:
+                print(f'Error al escribir logs en la base de datos {db_id}: {e}')
+                written = 0
+            # Cada sentencia se confirma por separado: solo las filas de las que fallaron cuentan como fallidas
+            self.written += written
+            self.failed += len(rows) - written
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch or self._dropped:
+                self._write(batch)
+            if self._stop.is_set() and self._queue.empty():
+                return
+
+    def stop(self, timeout=10):
+        """Detiene el hilo después de escribir lo pendiente en la cola."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        with self._dropped_lock:
+            dropped = sum(self._dropped.values())
+        return {'queued': self._queue.qsize(), 'written': self.written,
+                'failed': self.failed, 'dropped_pending': dropped}
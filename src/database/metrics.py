@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+
+# Instrumentación opcional de la capa de base de datos (DB_METRICS_ENABLED=1)
+DB_METRICS_ENABLED = os.getenv('DB_METRICS_ENABLED', '0') == '1'
+
+# Límites superiores (segundos) de los buckets del histograma de latencia
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Stat:
+    __slots__ = ('count', 'errors', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def add(self, seconds, error):
+        self.count += 1
+        self.errors += int(error)
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def quantile(self, q):
+        """Cuantil aproximado: límite superior del bucket donde cae q."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else self.max
+        return self.max
+
+
+class _Timer:
+    __slots__ = ('metrics', 'key', 'start')
+
+    def __init__(self, metrics, key):
+        self.metrics = metrics
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._add(self.key, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class QueryMetrics:
+    """
+    Contadores, errores e histogramas de latencia por (etiqueta, db_id, fase).
+
+    La etiqueta es el nombre de la variable de la consulta en database/db.py
+    (por ejemplo 'insert_iclock_query'); las fases son 'acquire', 'connect',
+    'validate', 'query' y 'commit' ('create' y 'load' en la migración por tabla temporal).
+    """
+
+    def __init__(self, enabled=DB_METRICS_ENABLED):
+        self.enabled = enabled
+        self._stats = {}
+        self._labels = {}
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+
+    def register_queries(self, namespace):
+        """Registra como etiquetas los nombres de las variables *_query de un módulo."""
+        for name, value in namespace.items():
+            if name.endswith('_query') and isinstance(value, str):
+                self._labels[value] = name
+
+    def label(self, query):
+        label = self._labels.get(query)
+        if label is None:
+            label = 'sql:' + ' '.join(query.split())[:60]
+        return label
+
+    def timer(self, label, db_id, phase):
+        """Context manager que mide una fase; sin costo cuando las métricas están desactivadas."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, (label, db_id, phase))
+
+    def observe(self, label, db_id, phase, seconds, error=False):
+        if self.enabled:
+            self._add((label, db_id, phase), seconds, error)
+
+    def _add(self, key, seconds, error):
+        with self._lock:
+            stat = self._stats.get(key)
+            if stat is None:
+                stat = self._stats[key] = _Stat()
+            stat.add(seconds, error)
+
+    def snapshot(self):
+        """Retorna las métricas ordenadas por tiempo total descendente."""
+        with self._lock:
+            items = [(key, stat.count, stat.errors, stat.total, stat.max, list(stat.buckets), stat.quantile(0.5), stat.quantile(0.95))
+                     for key, stat in self._stats.items()]
+        items.sort(key=lambda item: item[3], reverse=True)
+        return {
+            'enabled': self.enabled,
+            'since': self._started_at,
+            'buckets': list(LATENCY_BUCKETS),
+            'queries': [
+                {
+                    'label': label, 'db_id': db_id, 'phase': phase,
+                    'count': count, 'errors': errors,
+                    'total_seconds': round(total, 6),
+                    'avg_seconds': round(total / count, 6) if count else 0.0,
+                    'p50_seconds': p50, 'p95_seconds': p95,
+                    'max_seconds': round(maximum, 6),
+                    'histogram': buckets,
+                }
+                for (label, db_id, phase), count, errors, total, maximum, buckets, p50, p95 in items
+            ],
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._started_at = time.time()
+
+
+# Instancia global de métricas de base de datos
+db_metrics = QueryMetrics()
@@ -0,0 +1,172 @@
+import threading
+import time
+from collections import deque
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones thread-safe para una base de datos.
+
+    Parámetros:
+      - connect (callable): Función que abre una conexión nueva (o devuelve None si falla).
+      - min_size (int): Conexiones inactivas que se conservan aunque superen idle_timeout.
+      - max_size (int): Máximo de conexiones abiertas (prestadas + inactivas).
+      - idle_timeout (float): Segundos tras los cuales una conexión inactiva se cierra.
+      - validate_after (float): Segundos de inactividad a partir de los cuales se valida
+        la conexión con 'SELECT 1' antes de prestarla.
+      - acquire_timeout (float): Segundos máximos de espera por una conexión libre.
+      - observe (callable, opcional): observe(fase, segundos, error) para las fases
+        'connect' y 'validate' (instrumentación).
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, idle_timeout=300,
+                 validate_after=30, acquire_timeout=10, name='', observe=None):
+        self._connect = connect
+        self._observe = observe
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size)
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self.acquire_timeout = acquire_timeout
+        self.name = name
+        self._idle = deque()          # (conn, ultimo_uso); a la derecha las más recientes
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def _timed(self, phase, func, *args):
+        if self._observe is None:
+            return func(*args)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = func(*args)
+            return result
+        finally:
+            self._observe(phase, time.perf_counter() - start, result is None or result is False)
+
+    def _open(self):
+        conn = self._timed('connect', self._connect)
+        if conn is None:
+            raise ConnectionError(f'No se pudo abrir una conexión con {self.name}')
+        return conn
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(conn):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle_locked(self):
+        """Retira las conexiones inactivas expiradas (llamar con el lock tomado)."""
+        expired = []
+        now = time.monotonic()
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.idle_timeout:
+            expired.append(self._idle.popleft()[0])
+        return expired
+
+    def acquire(self):
+        """Presta una conexión; la valida solo si estuvo inactiva más de validate_after."""
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise ConnectionError(f'El pool de {self.name} está cerrado')
+                expired = self._evict_idle_locked()
+                conn, last_used = None, None
+                while True:
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._in_use + len(self._idle) < self.max_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f'No hay conexiones libres en el pool de {self.name}')
+                    self._cond.wait(remaining)
+                self._in_use += 1
+
+            for old in expired:
+                self._close(old)
+
+            if conn is None:
+                try:
+                    return self._open()
+                except Exception:
+                    self._forget()
+                    raise
+
+            if time.monotonic() - last_used <= self.validate_after or self._timed('validate', self._is_alive, conn):
+                return conn
+
+            # La conexión estaba caída: se descarta y se intenta con otra
+            self._close(conn)
+            self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify()
+
+    def release(self, conn, broken=False):
+        """Devuelve la conexión al pool; si está rota (o el pool cerrado) se cierra."""
+        if not broken:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+
+        with self._cond:
+            self._in_use -= 1
+            if broken or self._closed:
+                keep = False
+            else:
+                self._idle.append((conn, time.monotonic()))
+                keep = True
+            expired = self._evict_idle_locked()
+            self._cond.notify()
+
+        if not keep:
+            self._close(conn)
+        for old in expired:
+            self._close(old)
+
+    def fill(self):
+        """Abre conexiones hasta alcanzar min_size (sin lanzar errores)."""
+        while True:
+            with self._cond:
+                if self._closed or self._in_use + len(self._idle) >= self.min_size:
+                    return
+                self._in_use += 1
+            try:
+                conn = self._open()
+            except Exception:
+                self._forget()
+                return
+            self.release(conn)
+
+    def close(self):
+        """Cierra las conexiones inactivas; las prestadas se cierran al devolverse."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._close(conn)
+
+    def stats(self):
+        with self._cond:
+            return {'in_use': self._in_use, 'idle': len(self._idle), 'max_size': self.max_size}
@@ -0,0 +1,208 @@
+"""
+Verificación y creación idempotente de los índices que usan las consultas de la migración.
+
+Uso (desde la carpeta src):
+    python -m database.schema              # crea los índices faltantes y reporta el costo antes/después
+    python -m database.schema --check      # solo reporta, no crea nada
+    python -m database.schema --unique     # además crea las restricciones únicas (pin, time)
+
+Al iniciar la API se ejecuta si SCHEMA_BOOTSTRAP=1.
+"""
+import argparse
+import os
+import re
+from datetime import datetime, timedelta
+from database.backends import get_backend
+from database.db import (get_db_connection, DB_CONFIG, existing_keys_iclock_query, existing_keys_acc_monitor_log_query,
+                         existing_keys_acc_monitor_log_sj_query, last_times_iclock_query, last_times_acc_monitor_log_query,
+                         last_times_acc_monitor_log_sj_query)
+
+# Ejecutar la verificación de índices al iniciar la API y crear también las restricciones únicas
+SCHEMA_BOOTSTRAP = os.getenv('SCHEMA_BOOTSTRAP', '0') == '1'
+SCHEMA_UNIQUE_KEYS = os.getenv('SCHEMA_UNIQUE_KEYS', '0') == '1'
+
+# Índices requeridos: un índice existente cubre la consulta si sus columnas clave empiezan por 'columns'
+SCHEMA_INDEXES = [
+    {'db_id': 2, 'table': 'iclock_transaction', 'name': 'IX_iclock_transaction_punch_time_emp_code',
+     'columns': ['punch_time', 'emp_code']},
+    {'db_id': 1, 'table': 'acc_monitor_log', 'name': 'IX_acc_monitor_log_time_pin',
+     'columns': ['time', 'pin']},
+    {'db_id': 1, 'table': 'acc_monitor_log_sj', 'name': 'IX_acc_monitor_log_sj_time_pin',
+     'columns': ['time', 'pin']},
+    # Último registro por empleado (last_times_*: WHERE pin IN (...) GROUP BY pin, MAX(time))
+    {'db_id': 2, 'table': 'iclock_transaction', 'name': 'IX_iclock_transaction_emp_code_punch_time',
+     'columns': ['emp_code', 'punch_time']},
+    {'db_id': 1, 'table': 'acc_monitor_log', 'name': 'IX_acc_monitor_log_pin_time',
+     'columns': ['pin', 'time']},
+    {'db_id': 1, 'table': 'acc_monitor_log_sj', 'name': 'IX_acc_monitor_log_sj_pin_time',
+     'columns': ['pin', 'time']},
+    {'db_id': 2, 'table': 'personnel_employee', 'name': 'IX_personnel_employee_emp_code',
+     'columns': ['emp_code']},
+    {'db_id': 1, 'table': 'Parametros_Sistema', 'name': 'IX_Parametros_Sistema_id_grupo_prm_descripcion',
+     'columns': ['id_grupo', 'prm_descripcion']},
+]
+
+# Restricciones únicas opcionales sobre (pin, time); fallan si la tabla ya tiene duplicados
+SCHEMA_UNIQUE_INDEXES = [
+    {'db_id': 2, 'table': 'iclock_transaction', 'name': 'UX_iclock_transaction_emp_code_punch_time',
+     'columns': ['emp_code', 'punch_time'], 'unique': True},
+    {'db_id': 1, 'table': 'acc_monitor_log', 'name': 'UX_acc_monitor_log_pin_time',
+     'columns': ['pin', 'time'], 'unique': True},
+    {'db_id': 1, 'table': 'acc_monitor_log_sj', 'name': 'UX_acc_monitor_log_sj_pin_time',
+     'columns': ['pin', 'time'], 'unique': True},
+]
+
+# Consultas de deduplicación cuyo costo estimado se reporta antes y después
+DEDUPE_QUERIES = [
+    ('existing_keys_iclock_query', 2, existing_keys_iclock_query, 'range'),
+    ('existing_keys_acc_monitor_log_query', 1, existing_keys_acc_monitor_log_query, 'range'),
+    ('existing_keys_acc_monitor_log_sj_query', 1, existing_keys_acc_monitor_log_sj_query, 'range'),
+    ('last_times_iclock_query', 2, last_times_iclock_query, 'pins'),
+    ('last_times_acc_monitor_log_query', 1, last_times_acc_monitor_log_query, 'pins'),
+    ('last_times_acc_monitor_log_sj_query', 1, last_times_acc_monitor_log_sj_query, 'pins'),
+]
+
+SCHEMA_SQL = {
+    'mssql': {
+        'index_columns': """SELECT i.name, c.name, i.is_unique
+FROM sys.indexes i
+JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+JOIN sys.columns c ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+WHERE i.object_id = OBJECT_ID(?) AND ic.key_ordinal > 0
+ORDER BY i.name, ic.key_ordinal""",
+        'create': """CREATE {unique}NONCLUSTERED INDEX [{name}] ON [dbo].[{table}] ({columns})""",
+    },
+    'sqlite': {
+        'create': """CREATE {unique}INDEX IF NOT EXISTS [{name}] ON [{table}] ({columns})""",
+    },
+}
+
+
+def _index_columns(cursor, table):
+    """Retorna {nombre_indice: ([columnas clave en orden], es_unico)} de la tabla."""
+    indexes = {}
+    if get_backend().name == 'sqlite':
+        for _, name, unique, *_ in cursor.execute(f"PRAGMA index_list([{table}])").fetchall():
+            columns = [row[2] for row in cursor.execute(f"PRAGMA index_info([{name}])").fetchall()]
+            indexes[name] = (columns, bool(unique))
+        return indexes
+
+    for name, column, unique in cursor.execute(SCHEMA_SQL['mssql']['index_columns'], (f'dbo.{table}',)).fetchall():
+        indexes.setdefault(name, ([], bool(unique)))[0].append(column)
+    return indexes
+
+
+def _covering_index(indexes, spec):
+    """Nombre del índice existente cuyas columnas clave empiezan por las requeridas, o None."""
+    wanted = [column.lower() for column in spec['columns']]
+    for name, (columns, unique) in indexes.items():
+        if spec.get('unique') and not unique:
+            continue
+        if [column.lower() for column in columns[:len(wanted)]] == wanted:
+            return name
+    return None
+
+
+def ensure_indexes(unique=SCHEMA_UNIQUE_KEYS, create=True):
+    """
+    Verifica los índices de SCHEMA_INDEXES (y SCHEMA_UNIQUE_INDEXES si unique) y crea los faltantes.
+
+    Retorna:
+      - Lista de diccionarios con 'table', 'columns', 'status' ('exists', 'created', 'missing' o 'error')
+        e 'index' (nombre del índice existente o creado).
+    """
+    specs = SCHEMA_INDEXES + (SCHEMA_UNIQUE_INDEXES if unique else [])
+    create_sql = SCHEMA_SQL[get_backend().name]['create']
+    report = []
+    for spec in specs:
+        entry = {'table': spec['table'], 'columns': spec['columns'], 'index': None}
+        try:
+            with get_db_connection(spec['db_id'], 'schema') as conn:
+                cursor = conn.cursor()
+                existing = _covering_index(_index_columns(cursor, spec['table']), spec)
+                if existing is not None:
+                    entry.update(status='exists', index=existing)
+                elif not create:
+                    entry['status'] = 'missing'
+                else:
+                    cursor.execute(create_sql.format(
+                        unique='UNIQUE ' if spec.get('unique') else '',
+                        name=spec['name'],
+                        table=spec['table'],
+                        columns=', '.join(f'[{column}]' for column in spec['columns']),
+                    ))
+                    conn.commit()
+                    entry.update(status='created', index=spec['name'])
+                cursor.close()
+        except Exception as e:
+            print(f'Error al verificar el índice de {spec["table"]} ({", ".join(spec["columns"])}) '
+                  f'en {DB_CONFIG[spec["db_id"]]["name"]}: {e}')
+            entry.update(status='error', error=str(e))
+        report.append(entry)
+    return report
+
+
+def _plan_cost(cursor, query, params):
+    """Costo estimado del plan (SQL Server) o detalle del plan (SQLite) sin ejecutar la consulta."""
+    if get_backend().name == 'sqlite':
+        rows = cursor.execute('EXPLAIN QUERY PLAN ' + query, params).fetchall()
+        return {'cost': None, 'plan': '; '.join(row[-1] for row in rows)}
+
+    cursor.execute('SET SHOWPLAN_XML ON')
+    try:
+        plan = cursor.execute(query, params).fetchone()[0]
+    finally:
+        cursor.execute('SET SHOWPLAN_XML OFF')
+    costs = re.findall(r'StatementSubTreeCost="([0-9.Ee+-]+)"', plan)
+    operators = sorted(set(re.findall(r'PhysicalOp="([^"]+)"', plan)))
+    return {'cost': float(costs[0]) if costs else None, 'plan': ', '.join(operators)}
+
+
+def explain_dedupe_queries():
+    """Reporta el costo estimado de las consultas de deduplicación con parámetros de una ventana de 1 hora."""
+    end = datetime.now()
+    start = end - timedelta(hours=1)
+    report = []
+    for label, db_id, query, kind in DEDUPE_QUERIES:
+        if kind == 'range':
+            params = (start, end)
+        else:
+            query, params = query.format(placeholders='?'), ('0',)
+        try:
+            with get_db_connection(db_id, 'schema') as conn:
+                cursor = conn.cursor()
+                report.append({'label': label, 'db_id': db_id, **_plan_cost(cursor, query, params)})
+                cursor.close()
+        except Exception as e:
+            print(f'Error al estimar el costo de {label} en {DB_CONFIG[db_id]["name"]}: {e}')
+            report.append({'label': label, 'db_id': db_id, 'cost': None, 'plan': None, 'error': str(e)})
+    return report
+
+
+def bootstrap_schema(unique=SCHEMA_UNIQUE_KEYS, create=True):
+    """Reporta el costo de las consultas de deduplicación, crea los índices faltantes y vuelve a reportar."""
+    before = explain_dedupe_queries()
+    indexes = ensure_indexes(unique=unique, create=create)
+    after = explain_dedupe_queries() if any(entry['status'] == 'created' for entry in indexes) else before
+    return {'indexes': indexes, 'before': before, 'after': after}
+
+
+def print_report(report):
+    print('Índices:')
+    for entry in report['indexes']:
+        print(f"  {entry['table']:<20} ({', '.join(entry['columns'])}): {entry['status']}"
+              f"{' -> ' + entry['index'] if entry.get('index') else ''}")
+    print('Costo estimado de las consultas de deduplicación (antes -> después):')
+    for before, after in zip(report['before'], report['after']):
+        print(f"  {before['label']:<40} {before['cost']} -> {after['cost']}")
+        print(f"    antes:   {before['plan']}")
+        print(f"    después: {after['plan']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Verifica y crea los índices de las consultas de migración')
+    parser.add_argument('--check', action='store_true', help='Solo verificar, no crear índices')
+    parser.add_argument('--unique', action='store_true', default=SCHEMA_UNIQUE_KEYS,
+                        help='Crear también las restricciones únicas (pin, time)')
+    args = parser.parse_args()
+    print_report(bootstrap_schema(unique=args.unique, create=not args.check))
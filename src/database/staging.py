@@ -0,0 +1,183 @@
+from database.backends import get_backend
+from database.db import get_db_connection, DB_BULK_CHUNK_SIZE, DB_CONFIG
+from database.metrics import db_metrics
+
+# Destinos de la migración por tabla temporal: columnas en el mismo orden que las filas
+# construidas en migrate_db y columnas clave (pin, time) para la deduplicación
+STAGING_TARGETS = {
+    'iclock': {
+        'db_id': 2,
+        'table': 'iclock_transaction',
+        'pin': 'emp_code',
+        'time': 'punch_time',
+        'columns': ['emp_code', 'punch_time', 'punch_state', 'verify_type', 'work_code', 'terminal_sn',
+                    'terminal_alias', 'area_alias', 'source', 'purpose', 'crc', 'upload_time', 'emp_id',
+                    'terminal_id', 'is_mask', 'temperature', 'FechaBio'],
+    },
+    'acc_monitor_log': {
+        'db_id': 1,
+        'table': 'acc_monitor_log',
+        'pin': 'pin',
+        'time': 'time',
+        'columns': ['status', 'time', 'pin', 'device_id', 'device_name', 'verified', 'state',
+                    'event_type', 'event_point_type', 'event_point_id', 'event_point_name'],
+    },
+    'acc_monitor_log_sj': {
+        'db_id': 1,
+        'table': 'acc_monitor_log_sj',
+        'pin': 'pin',
+        'time': 'time',
+        'columns': ['status', 'time', 'pin', 'device_id', 'device_name', 'verified', 'state',
+                    'event_type', 'event_point_type', 'event_point_id', 'event_point_name'],
+    },
+}
+
+# Sentencias por motor. SQL Server: tabla temporal de sesión con los mismos tipos de columna que
+# la tabla destino y una sola sentencia que inserta y retorna los conteos.
+# En una sola sentencia por destino:
+#  - se descartan las claves (pin, time) que ya existen y las repetidas dentro de la página,
+#  - se aplica la regla de 30 minutos: si el último registro previo del pin es posterior a @cutoff
+#    se rechaza todo; si no, se aceptan los registros en orden hasta el primero posterior a @cutoff
+#    (incluido), igual que la evaluación fila a fila.
+STAGING_SQL = {
+    'mssql': {
+        'create': ["""SELECT TOP 0 {columns} INTO #staging_{target} FROM [dbo].[{table}];
+ALTER TABLE #staging_{target} ADD [seq] INT NULL;"""],
+        'insert': """INSERT INTO #staging_{target} ({columns}, [seq]) VALUES ({placeholders}, ?)""",
+        'merge': """SET NOCOUNT ON;
+DECLARE @cutoff DATETIME = ?;
+DECLARE @duplicates INT = (SELECT COUNT(*) FROM #staging_{target} s
+    WHERE EXISTS (SELECT 1 FROM [dbo].[{table}] t WHERE t.[{pin}] = s.[{pin}] AND t.[{time}] = s.[{time}]));
+
+WITH candidates AS (
+    SELECT s.*, ROW_NUMBER() OVER (PARTITION BY s.[{pin}], s.[{time}] ORDER BY s.[seq]) AS dup_rank
+    FROM #staging_{target} s
+    WHERE NOT EXISTS (SELECT 1 FROM [dbo].[{table}] t WHERE t.[{pin}] = s.[{pin}] AND t.[{time}] = s.[{time}])
+), ranked AS (
+    SELECT c.*, MIN(CASE WHEN c.[{time}] > @cutoff THEN c.[seq] END) OVER (PARTITION BY c.[{pin}]) AS first_recent_seq
+    FROM candidates c
+    WHERE c.dup_rank = 1
+), prior AS (
+    SELECT t.[{pin}], MAX(t.[{time}]) AS last_time
+    FROM [dbo].[{table}] t
+    WHERE t.[{pin}] IN (SELECT DISTINCT [{pin}] FROM #staging_{target})
+    GROUP BY t.[{pin}]
+)
+INSERT INTO [dbo].[{table}] ({columns})
+SELECT {ranked_columns}
+FROM ranked r
+LEFT JOIN prior p ON p.[{pin}] = r.[{pin}]
+WHERE (p.last_time IS NULL OR p.last_time <= @cutoff)
+  AND (r.first_recent_seq IS NULL OR r.[seq] <= r.first_recent_seq);
+
+DECLARE @inserted INT = @@ROWCOUNT;
+DROP TABLE #staging_{target};
+SELECT @inserted, @duplicates;""",
+        'drop': """IF OBJECT_ID('tempdb..#staging_{target}') IS NOT NULL DROP TABLE #staging_{target};""",
+    },
+    # SQLite no admite variables ni varias sentencias por execute: los conteos se obtienen por separado.
+    # El WITH va dentro del INSERT: con 'WITH ... INSERT' sqlite3 no informa rowcount (retorna -1)
+    'sqlite': {
+        'create': ["""CREATE TEMP TABLE staging_{target} AS SELECT {columns} FROM [{table}] WHERE 0""",
+                   """ALTER TABLE temp.staging_{target} ADD COLUMN [seq] INTEGER"""],
+        'insert': """INSERT INTO temp.staging_{target} ({columns}, [seq]) VALUES ({placeholders}, ?)""",
+        'duplicates': """SELECT COUNT(*) FROM temp.staging_{target} s
+    WHERE EXISTS (SELECT 1 FROM [{table}] t WHERE t.[{pin}] = s.[{pin}] AND t.[{time}] = s.[{time}])""",
+        'merge': """INSERT INTO [{table}] ({columns})
+WITH candidates AS (
+    SELECT s.*, ROW_NUMBER() OVER (PARTITION BY s.[{pin}], s.[{time}] ORDER BY s.[seq]) AS dup_rank
+    FROM temp.staging_{target} s
+    WHERE NOT EXISTS (SELECT 1 FROM [{table}] t WHERE t.[{pin}] = s.[{pin}] AND t.[{time}] = s.[{time}])
+), ranked AS (
+    SELECT c.*, MIN(CASE WHEN c.[{time}] > :cutoff THEN c.[seq] END) OVER (PARTITION BY c.[{pin}]) AS first_recent_seq
+    FROM candidates c
+    WHERE c.dup_rank = 1
+), prior AS (
+    SELECT t.[{pin}], MAX(t.[{time}]) AS last_time
+    FROM [{table}] t
+    WHERE t.[{pin}] IN (SELECT DISTINCT [{pin}] FROM temp.staging_{target})
+    GROUP BY t.[{pin}]
+)
+SELECT {ranked_columns}
+FROM ranked r
+LEFT JOIN prior p ON p.[{pin}] = r.[{pin}]
+WHERE (p.last_time IS NULL OR p.last_time <= :cutoff)
+  AND (r.first_recent_seq IS NULL OR r.[seq] <= r.first_recent_seq)""",
+        'drop': """DROP TABLE IF EXISTS temp.staging_{target}""",
+    },
+}
+
+
+def _render(query, target):
+    spec = STAGING_TARGETS[target]
+    return query.format(
+        target=target,
+        table=spec['table'],
+        pin=spec['pin'],
+        time=spec['time'],
+        columns=', '.join(f'[{column}]' for column in spec['columns']),
+        ranked_columns=', '.join(f'r.[{column}]' for column in spec['columns']),
+        placeholders=', '.join('?' * len(spec['columns'])),
+    )
+
+
+def merge_staged_rows(target, rows, cutoff):
+    """
+    Carga las filas normalizadas de una página en una tabla temporal y las inserta en el destino
+    con una sola sentencia set-based (deduplicación y regla de 30 minutos en el servidor).
+
+    Parámetros:
+      - target (str): 'iclock', 'acc_monitor_log' o 'acc_monitor_log_sj'.
+      - rows (list): Filas en el orden de columnas de STAGING_TARGETS[target]['columns'].
+      - cutoff (datetime): Instante límite de la regla de 30 minutos (hora de carga - 30 min).
+
+    Retorna:
+      - Diccionario con 'staged', 'inserted', 'duplicates' y 'rejected', o None si falla.
+    """
+    rows = [tuple(row) + (seq,) for seq, row in enumerate(rows)]
+    if not rows:
+        return {'staged': 0, 'inserted': 0, 'duplicates': 0, 'rejected': 0}
+
+    db_id = STAGING_TARGETS[target]['db_id']
+    sql = STAGING_SQL[get_backend().name]
+    label = f'merge_staging_{target}_query'
+    try:
+        with get_db_connection(db_id, label) as conn:
+            cursor = conn.cursor()
+            try:
+                with db_metrics.timer(label, db_id, 'create'):
+                    for statement in sql['create']:
+                        cursor.execute(_render(statement, target))
+                cursor.fast_executemany = True
+                with db_metrics.timer(label, db_id, 'load'):
+                    insert_query = _render(sql['insert'], target)
+                    for start in range(0, len(rows), DB_BULK_CHUNK_SIZE):
+                        cursor.executemany(insert_query, rows[start:start + DB_BULK_CHUNK_SIZE])
+                with db_metrics.timer(label, db_id, 'query'):
+                    if 'duplicates' in sql:
+                        duplicates = cursor.execute(_render(sql['duplicates'], target)).fetchone()[0]
+                        cursor.execute(_render(sql['merge'], target), {'cutoff': cutoff})
+                        inserted = cursor.rowcount
+                        cursor.execute(_render(sql['drop'], target))
+                    else:
+                        cursor.execute(_render(sql['merge'], target), (cutoff,))
+                        inserted, duplicates = cursor.fetchone()
+                with db_metrics.timer(label, db_id, 'commit'):
+                    conn.commit()
+            except Exception:
+                # La tabla temporal vive en la sesión; se elimina antes de devolver la conexión al pool
+                conn.rollback()
+                cursor.execute(_render(sql['drop'], target))
+                raise
+            finally:
+                cursor.close()
+    except Exception as e:
+        print(f'Error en la migración por tabla temporal {target} en {DB_CONFIG[db_id]["name"]}: {e}')
+        return None
+
+    return {
+        'staged': len(rows),
+        'inserted': inserted,
+        'duplicates': duplicates,
+        'rejected': len(rows) - inserted - duplicates,
+    }
@@ -0,0 +1,97 @@
+from contextlib import nullcontext
+from itertools import groupby
+
+
+class UnitOfWork:
+    """
+    Sentencias de escritura acumuladas sobre una sola conexión y confirmadas en sub-lotes.
+
+    Las sentencias consecutivas con la misma consulta se envían con executemany y cada sub-lote
+    termina en un único commit. Si un sub-lote falla se hace rollback solo de ese sub-lote y sus
+    sentencias se reintentan una por una, de modo que una fila inválida no descarta las demás.
+    Las sentencias que fallan también en el reintento quedan en 'failed'; complete es False si hubo alguna.
+
+    Parámetros:
+      - conn: Conexión prestada por el pool (la maneja get_db_connection).
+      - batch_size (int): Sentencias por sub-lote (commit) antes de confirmar automáticamente.
+      - name (str): Nombre de la base para los mensajes de error.
+      - timer (callable, opcional): timer(consulta, fase) que retorna un context manager de métricas.
+    """
+
+    def __init__(self, conn, batch_size=500, name='', timer=None):
+        self.conn = conn
+        self.batch_size = max(1, batch_size)
+        self.name = name
+        self._timer = timer
+        self._pending = []            # (consulta, parámetros, on_commit)
+        self.applied = 0
+        self.failed = 0
+
+    @property
+    def complete(self):
+        """True si todas las sentencias encoladas hasta ahora quedaron confirmadas."""
+        return self.failed == 0
+
+    def add(self, query, params, on_commit=None):
+        """
+        Encola una sentencia; on_commit se invoca solo cuando su sub-lote quedó confirmado.
+        Retorna el número de sentencias aplicadas si se alcanzó batch_size y se confirmó el sub-lote.
+        """
+        self._pending.append((query, tuple(params), on_commit))
+        if len(self._pending) >= self.batch_size:
+            return self.flush()
+        return 0
+
+    def _measure(self, query, phase):
+        if self._timer is None:
+            return nullcontext()
+        return self._timer(query, phase)
+
+    def flush(self):
+        """Confirma las sentencias pendientes y retorna cuántas se aplicaron."""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        cursor = self.conn.cursor()
+        cursor.fast_executemany = True
+        try:
+            try:
+                for query, group in groupby(pending, key=lambda item: item[0]):
+                    params = [item[1] for item in group]
+                    with self._measure(query, 'query'):
+                        if len(params) == 1:
+                            cursor.execute(query, params[0])
+                        else:
+                            cursor.executemany(query, params)
+                with self._measure(pending[-1][0], 'commit'):
+                    self.conn.commit()
+                committed = pending
+            except Exception as e:
+                self.conn.rollback()
+                print(f'Error al confirmar un sub-lote de {len(pending)} sentencias en {self.name}: {e}. '
+                      'Se reintenta fila por fila.')
+                committed = self._retry_rows(cursor, pending)
+        finally:
+            cursor.close()
+
+        self.applied += len(committed)
+        for _, _, on_commit in committed:
+            if on_commit is not None:
+                on_commit()
+        return len(committed)
+
+    def _retry_rows(self, cursor, pending):
+        committed = []
+        for item in pending:
+            query, params, _ = item
+            try:
+                cursor.execute(query, params)
+                self.conn.commit()
+                committed.append(item)
+            except Exception as e:
+                self.conn.rollback()
+                self.failed += 1
+                print(f'Sentencia descartada en {self.name} con parámetros {params}: {e}')
+        return committed
+
@@ -0,0 +1,64 @@
+from utils.alarm_time import epoch_to_local, format_alarm_time, local_to_epoch
+
+
+class AccessRecord:
+    """
+    Registro de acceso del DSS con solo los campos que usan las migraciones.
+
+    alarmTime se guarda en segundos UTC (int); punch_time es la hora local (datetime) que se
+    escribe en las tablas de marcajes, calculada una sola vez al crear el registro (al normalizar
+    la página); el texto '%Y-%m-%d %H:%M:%S' se genera solo en to_dict(). Con __slots__ cada registro ocupa una fracción del
+    diccionario completo que entrega el DSS.
+
+    raw conserva el diccionario completo del DSS solo en las consultas de la API
+    (/obtener-registros-7-dias), que responden con todos sus campos; en la migración es None.
+    """
+
+    __slots__ = ('id', 'personId', 'firstName', 'pointName', 'alarmTime', 'punch_time', 'raw')
+
+    def __init__(self, id, personId, firstName, pointName, alarmTime, raw=None):
+        self.id = id
+        self.personId = personId
+        self.firstName = firstName
+        self.pointName = pointName
+        self.alarmTime = alarmTime
+        # Hora local del marcaje (datetime), o None si el DSS no envió alarmTime
+        self.punch_time = epoch_to_local(alarmTime) if alarmTime is not None else None
+        self.raw = raw
+
+    @classmethod
+    def from_dss(cls, record, keep_raw=False):
+        """Crea el registro a partir del diccionario del DSS (alarmTime en segundos UTC)."""
+        alarm_time = record.get("alarmTime")
+        return cls(record.get("id"), record.get("personId"), record.get("firstName"), record.get("pointName"),
+                   int(alarm_time) if alarm_time not in (None, "") else None, record if keep_raw else None)
+
+    @classmethod
+    def from_dict(cls, record):
+        """Crea el registro a partir de to_dict() (spool): alarmTime en texto, datetime o segundos."""
+        alarm_time = record.get("alarmTime")
+        return cls(record.get("id"), record.get("personId"), record.get("firstName"), record.get("pointName"),
+                   local_to_epoch(alarm_time) if alarm_time not in (None, "") else None)
+
+    @property
+    def identity(self):
+        """Clave para deduplicar: el id del DSS o, si falta, (personId, alarmTime)."""
+        return self.id if self.id is not None else (self.personId, self.alarmTime)
+
+    def to_dict(self):
+        """
+        Diccionario para la API y el spool, con alarmTime como '%Y-%m-%d %H:%M:%S' en hora local.
+        Si se conservó el registro del DSS (raw) se incluyen todos sus campos.
+        """
+        if self.raw is not None:
+            return {**self.raw, "alarmTime": format_alarm_time(self.punch_time)}
+        return {
+            "id": self.id,
+            "personId": self.personId,
+            "firstName": self.firstName,
+            "pointName": self.pointName,
+            "alarmTime": format_alarm_time(self.punch_time),
+        }
+
+    def __repr__(self):
+        return f'AccessRecord(id={self.id!r}, personId={self.personId!r}, alarmTime={self.alarmTime!r})'
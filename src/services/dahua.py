@@ -1,16 +1,60 @@
-import requests
+import os
+import time
 import traceback
-from datetime import datetime, timedelta
-import pytz
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import ijson
+from ijson.common import ObjectBuilder
 from config.api import get_global_token
-from database.db import get_host_dss_query, get_port_dss_query, get_enpoint_access_record_dss_query
+from database.db import get_enpoint_access_record_dss_query
+from services.dss_client import dss_client, dss_breaker
+from services.resilience import backoff_delay, CircuitOpenError
+from services.access_record import AccessRecord
+
+# Paginación del endpoint de registros de acceso
+DSS_PAGE_SIZE = int(os.getenv('DSS_PAGE_SIZE', '1000'))
+DSS_PAGE_WORKERS = int(os.getenv('DSS_PAGE_WORKERS', '4'))
+DSS_PAGE_RETRIES = int(os.getenv('DSS_PAGE_RETRIES', '3'))
+DSS_PAGE_RETRY_DELAY = float(os.getenv('DSS_PAGE_RETRY_DELAY', '1'))  # Segundos (base de la espera exponencial con jitter)
+# Rangos largos: se dividen en ventanas consultadas en paralelo (una ventana que excede el tamaño de página se divide otra vez)
+DSS_RANGE_WINDOW_HOURS = float(os.getenv('DSS_RANGE_WINDOW_HOURS', '6'))
+DSS_RANGE_MIN_WINDOW = int(os.getenv('DSS_RANGE_MIN_WINDOW', '300'))   # Segundos; por debajo se pagina la ventana
+DSS_RANGE_WORKERS = int(os.getenv('DSS_RANGE_WORKERS', str(DSS_PAGE_WORKERS)))
+# Lectura de pageData en streaming (ijson) en las migraciones programadas
+DSS_STREAMING = os.getenv('DSS_STREAMING', '0') == '1'
+# Código de respuesta correcta del DSS (campo 'code' del cuerpo)
+DSS_SUCCESS_CODE = '1000'
+
+def normalize_access_records(data, keep_raw=False):
+    """
+    Normaliza la respuesta del DSS: pageData siempre es una lista de AccessRecord.
+    keep_raw=True conserva en cada registro el diccionario completo (respuestas de la API).
+    """
+    # Normalizar pageData
+    if data.get("data") is None:
+        data["data"] = {}
+    if data["data"].get("pageData") is None:
+        data["data"]["pageData"] = []
+
+    # Un AccessRecord por registro; en la migración el diccionario completo del DSS se descarta
+    data["data"]["pageData"] = [normalize_access_record(record, keep_raw) for record in data["data"]["pageData"]]
+
+    return data
+
+def normalize_access_record(record, keep_raw=False):
+    """
+    Crea el AccessRecord del registro: alarmTime en segundos UTC y punch_time (hora local)
+    calculada una sola vez; el texto '%Y-%m-%d %H:%M:%S' se genera solo en la respuesta de la API.
+    """
+    return AccessRecord.from_dss(record, keep_raw)
 
 def fetch_access_control_records_page(
     page: str,               # (string) Número de página (requerido)
     pageSize: str,           # (string) Cantidad de registros por página (requerido)
     startTime: str,          # (string) Tiempo de inicio en segundos (requerido)
     endTime: str,            # (string) Tiempo de fin en segundos (requerido)
-    token
+    token,
+    keep_raw=False           # Conservar el registro completo del DSS (respuestas de la API)
 ) -> dict:
     """
     Función para obtener registros de control de acceso por página.
@@ -30,8 +74,8 @@ def fetch_access_control_records_page(
     if not token:
         token = get_global_token()
     
-    # URL del endpoint
-    url = f"https://{get_host_dss_query()[0]}:{get_port_dss_query()[0]}{get_enpoint_access_record_dss_query()[0]}"
+    # Endpoint (relativo al host DSS configurado)
+    url = get_enpoint_access_record_dss_query()[0]
     
     # Definir los encabezados requeridos
     headers = {
@@ -52,28 +96,12 @@ def fetch_access_control_records_page(
         # print("URL:", url)
         # print("Encabezados:", headers)
         # print("Payload:", payload)
-        response = requests.post(url, json=payload, headers=headers, verify=False)
+        response = dss_client.post(url, json=payload, headers=headers)
         # print("Status Code:", response.status_code)
         
         if response.status_code == 200:
             try:
-                data = response.json()
-
-                # Normalizar pageData
-                if data.get("data") is None:
-                    data["data"] = {}
-                if data["data"].get("pageData") is None:
-                    data["data"]["pageData"] = []
-
-                # Ahora pageData siempre es iterable
-                for record in data["data"]["pageData"]:
-                    alarm_time_seconds = record.get("alarmTime")
-                    if alarm_time_seconds:
-                        utc_time = datetime.utcfromtimestamp(int(alarm_time_seconds)).replace(tzinfo=pytz.utc)
-                        ecuador_time = utc_time - timedelta(hours=5)
-                        record["alarmTime"] = ecuador_time.strftime("%Y-%m-%d %H:%M:%S")
-
-                return data
+                return normalize_access_records(response.json(), keep_raw)
 
             except Exception as e:
                 print("Error al procesar los datos:", e)
@@ -83,11 +111,261 @@ def fetch_access_control_records_page(
             print("Error en la solicitud:", response.status_code, response.text)
             return {"error": f"Error {response.status_code}: {response.text}"}
     
+    except CircuitOpenError as e:
+        print("Solicitud omitida:", e)
+        return {"error": str(e)}
+
     except Exception as e:
         print("Excepción durante la solicitud:", e)
         traceback.print_exc()
         return {"error": str(e)}
 
+def _fetch_page_with_retries(page, pageSize, startTime, endTime, token, keep_raw=False):
+    """Obtiene una página reintentando hasta DSS_PAGE_RETRIES veces si el DSS responde con error."""
+    data = None
+    for attempt in range(1, DSS_PAGE_RETRIES + 1):
+        data = fetch_access_control_records_page(
+            page=str(page),
+            pageSize=str(pageSize),
+            startTime=startTime,
+            endTime=endTime,
+            token=token,
+            keep_raw=keep_raw
+        )
+        if data and "error" not in data:
+            return data
+        # Con el circuito abierto no tiene sentido reintentar: el DSS no responde
+        if attempt < DSS_PAGE_RETRIES and dss_breaker.state != 'open':
+            print(f'Reintentando la página {page} ({attempt}/{DSS_PAGE_RETRIES}): {data.get("error") if data else data}')
+            time.sleep(backoff_delay(attempt, DSS_PAGE_RETRY_DELAY))
+        else:
+            break
+    return data
+
+def iter_access_control_pages(startTime, endTime, token=None, pageSize=None, workers=None):
+    """
+    Genera en orden las páginas de registros de acceso del rango [startTime, endTime].
+
+    La primera página se obtiene sola para leer totalCount; las siguientes se descargan en
+    paralelo (como máximo 'workers' a la vez) y se entregan en orden de página.
+
+    Retorna (generador):
+      - (número de página, respuesta del DSS). Si una página falla tras los reintentos su
+        respuesta es el diccionario de error de fetch_access_control_records_page.
+    """
+    pageSize = int(pageSize or DSS_PAGE_SIZE)
+    workers = workers or DSS_PAGE_WORKERS
+    token = token or get_global_token()
+
+    first = _fetch_page_with_retries(1, pageSize, startTime, endTime, token)
+    yield 1, first
+    if not first or "error" in first:
+        return
+
+    total = int(first["data"].get("totalCount") or 0)
+    pages = -(-total // pageSize)
+    if pages <= 1:
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        next_page = 2
+        while pending or next_page <= pages:
+            # Ventana acotada: solo 'workers' páginas en vuelo y en memoria
+            while next_page <= pages and len(pending) < workers:
+                pending.append((next_page, executor.submit(_fetch_page_with_retries, next_page, pageSize, startTime, endTime, token)))
+                next_page += 1
+            page, future = pending.popleft()
+            yield page, future.result()
+
+def fetch_all_access_control_records(startTime, endTime, token=None, pageSize=None, workers=None):
+    """
+    Obtiene todas las páginas del rango y las une en una sola respuesta con el formato de
+    fetch_access_control_records_page (data.pageData y data.totalCount).
+
+    Retorna:
+      - La respuesta combinada; data.missingPages lista las páginas que no se pudieron obtener.
+      - El diccionario de error si falla la primera página.
+    """
+    result = None
+    missing = []
+    for page, data in iter_access_control_pages(startTime, endTime, token, pageSize, workers):
+        if not data or "error" in data:
+            if page == 1:
+                return data
+            print(f'No se pudo obtener la página {page} de registros de acceso: {data.get("error") if data else data}')
+            missing.append(page)
+            continue
+        if result is None:
+            result = data
+        else:
+            result["data"]["pageData"].extend(data["data"]["pageData"])
+    result["data"]["missingPages"] = missing
+    return result
+
+def _fetch_window(startTime, endTime, pageSize, token, min_window, keep_raw=False):
+    """
+    Obtiene la primera página de la ventana. Si la ventana excede pageSize se retornan sus dos
+    mitades para consultarlas por separado; si ya no se puede dividir se leen sus demás páginas.
+
+    Retorna:
+      - (respuesta o diccionario de error, lista de subventanas pendientes)
+    """
+    data = _fetch_page_with_retries(1, pageSize, startTime, endTime, token, keep_raw)
+    if not data or "error" in data:
+        return data, []
+    total = int(data["data"].get("totalCount") or 0)
+    if total <= pageSize:
+        return data, []
+    if endTime - startTime > min_window:
+        middle = (startTime + endTime) // 2
+        return data, [(startTime, middle), (middle, endTime)]
+    for page in range(2, -(-total // pageSize) + 1):
+        page_data = _fetch_page_with_retries(page, pageSize, startTime, endTime, token, keep_raw)
+        if not page_data or "error" in page_data:
+            return page_data, []
+        data["data"]["pageData"].extend(page_data["data"]["pageData"])
+    return data, []
+
+def range_windows(startTime, endTime, window_hours=None):
+    """Divide [startTime, endTime] en ventanas contiguas de 'window_hours' horas: [(inicio, fin)]."""
+    startTime, endTime = int(startTime), int(endTime)
+    window = max(int((window_hours or DSS_RANGE_WINDOW_HOURS) * 3600), 1)
+    return [(start, min(start + window, endTime)) for start in range(startTime, endTime, window)]
+
+def merge_range_result(result, records, missing):
+    """Arma la respuesta de un rango: registros (ya sin duplicados por identidad) ordenados por alarmTime."""
+    page_data = sorted(records.values(), key=lambda record: record.alarmTime or 0)
+    result["data"] = {"pageData": page_data, "totalCount": len(page_data), "missingWindows": sorted(missing)}
+    return result
+
+def fetch_access_control_records_range(startTime, endTime, token=None, window_hours=None, pageSize=None, workers=None,
+                                       min_window=None, keep_raw=False):
+    """
+    Obtiene los registros del rango [startTime, endTime] dividiéndolo en ventanas de 'window_hours'
+    horas consultadas en paralelo (como máximo 'workers' a la vez). Las ventanas que exceden
+    pageSize se dividen a la mitad hasta 'min_window' segundos; los registros se unen sin
+    duplicados por id (las ventanas contiguas comparten el segundo del borde).
+
+    Retorna:
+      - Respuesta con el formato de fetch_all_access_control_records, ordenada por alarmTime;
+        data.missingWindows lista las ventanas [inicio, fin] que no se pudieron obtener.
+      - El diccionario de error si no se pudo obtener ninguna ventana.
+    """
+    pageSize = int(pageSize or DSS_PAGE_SIZE)
+    min_window = min_window or DSS_RANGE_MIN_WINDOW
+    token = token or get_global_token()
+
+    windows = range_windows(startTime, endTime, window_hours)
+    records = {}
+    missing = []
+    result = error = None
+    with ThreadPoolExecutor(max_workers=workers or DSS_RANGE_WORKERS) as executor:
+        pending = {executor.submit(_fetch_window, start, end, pageSize, token, min_window, keep_raw): (start, end)
+                   for start, end in windows}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                bounds = pending.pop(future)
+                try:
+                    data, subwindows = future.result()
+                except Exception as e:
+                    data, subwindows = {"error": str(e)}, []
+                if not data or "error" in data:
+                    print(f'No se pudo obtener la ventana {bounds} de registros de acceso: {data.get("error") if data else data}')
+                    missing.append(list(bounds))
+                    error = data
+                    continue
+                for record in data["data"]["pageData"]:
+                    records.setdefault(record.identity, record)
+                if result is None:
+                    result = data
+                for start, end in subwindows:
+                    pending[executor.submit(_fetch_window, start, end, pageSize, token, min_window, keep_raw)] = (start, end)
+
+    if result is None:
+        return error
+    return merge_range_result(result, records, missing)
+
+def stream_access_control_records_page(page, pageSize, startTime, endTime, token=None, keep_raw=False):
+    """
+    Genera los registros normalizados de una página leyendo data.pageData de la respuesta
+    en streaming (ijson), sin cargar todo el JSON en memoria.
+
+    Lanza ConnectionError si el DSS responde con un código HTTP distinto de 200 o con un cuerpo de
+    error (campo 'code' distinto de DSS_SUCCESS_CODE, o sin 'code' ni data.pageData). Un error al
+    leer el cuerpo cuenta como falla del circuit breaker.
+    """
+    token = token or get_global_token()
+    headers = {
+        "X-Subject-Token": token,
+        "Content-Type": "application/json;charset=UTF-8",
+        "Accept-Language": "en"
+    }
+    payload = {
+        "page": str(page),
+        "pageSize": str(pageSize),
+        "startTime": startTime,
+        "endTime": endTime
+    }
+    response = dss_client.post(get_enpoint_access_record_dss_query()[0], json=payload, headers=headers, stream=True)
+    try:
+        if response.status_code != 200:
+            raise ConnectionError(f"Error {response.status_code}: {response.text}")
+        # Descomprimir gzip/deflate al leer el stream crudo
+        response.raw.decode_content = True
+        code = None
+        has_page_data = False
+        builder = None
+        try:
+            for prefix, event, value in ijson.parse(response.raw, use_float=True):
+                if prefix == "code" and event in ("number", "string"):
+                    code = str(value)
+                elif prefix == "data.pageData":
+                    has_page_data = True
+                elif prefix.startswith("data.pageData.item"):
+                    # Cada registro se arma por separado y se entrega al cerrarse su objeto
+                    if builder is None:
+                        builder = ObjectBuilder()
+                    builder.event(event, value)
+                    if prefix == "data.pageData.item" and event in ("end_map", "end_array"):
+                        record, builder = builder.value, None
+                        yield normalize_access_record(record, keep_raw)
+        except Exception as e:
+            # El DSS respondió 200 pero el cuerpo se cortó o no es JSON válido
+            dss_breaker.record_failure(e)
+            raise
+        if (code is not None and code != DSS_SUCCESS_CODE) or (code is None and not has_page_data):
+            raise ConnectionError(f"Respuesta del DSS sin registros (code {code})")
+    finally:
+        response.close()
+
+def stream_access_control_records(startTime, endTime, token=None, pageSize=None, keep_raw=False):
+    """
+    Genera todos los registros del rango página por página en streaming.
+    Se pide la página siguiente mientras la actual venga completa; una página que falla
+    antes de entregar registros se reintenta hasta DSS_PAGE_RETRIES veces.
+    """
+    pageSize = int(pageSize or DSS_PAGE_SIZE)
+    token = token or get_global_token()
+    page = 1
+    while True:
+        count = 0
+        for attempt in range(1, DSS_PAGE_RETRIES + 1):
+            try:
+                for record in stream_access_control_records_page(page, pageSize, startTime, endTime, token, keep_raw):
+                    count += 1
+                    yield record
+                break
+            except Exception as e:
+                if count or attempt == DSS_PAGE_RETRIES or dss_breaker.state == 'open':
+                    raise
+                print(f'Reintentando la página {page} en streaming ({attempt}/{DSS_PAGE_RETRIES}): {e}')
+                time.sleep(backoff_delay(attempt, DSS_PAGE_RETRY_DELAY))
+        if count < pageSize:
+            return
+        page += 1
+
 # /obms/api/v1.1/alarm-host/alarm-out/channel/list?deviceCode={deviceCode} 
 # /obms/api/v1.1/alarm-host/alarm-signal/channel/list?deviceCode={deviceCode}
 # /brms/api/v1.1/alarm/record/entrance-block-roster/detail?alarmCode={alarmCode}
@@ -0,0 +1,331 @@
+import asyncio
+import traceback
+import httpx
+from config.api import token_manager
+from database.db import get_host_dss_query, get_port_dss_query, get_user_dss_query, get_enpoint_access_record_dss_query
+from services.dahua import (normalize_access_records, range_windows, merge_range_result, DSS_PAGE_SIZE, DSS_PAGE_WORKERS,
+                            DSS_PAGE_RETRIES, DSS_PAGE_RETRY_DELAY, DSS_RANGE_MIN_WINDOW, DSS_RANGE_WORKERS)
+from services.resilience import backoff_delay
+from services.dss_client import dss_breaker, DSS_POOL_SIZE, DSS_CONNECT_TIMEOUT, DSS_READ_TIMEOUT, DSS_VERIFY_TLS, DSS_CA_BUNDLE
+
+
+class AsyncDssClient:
+    """
+    Cliente asyncio del DSS (httpx.AsyncClient): autenticación, keepalive, renovación del token
+    y descarga paginada de registros de acceso sobre un solo event loop.
+
+    Mantiene su propia sesión (token) con el DSS; las firmas se generan con las mismas
+    funciones del TokenManager sincrónico. Esas funciones y la configuración del DSS se leen
+    de la base (pyodbc, bloqueante), por eso se ejecutan en un hilo con asyncio.to_thread:
+    la configuración una sola vez al crear el cliente HTTP y las firmas al autenticarse.
+    """
+
+    def __init__(self, pool_size=DSS_POOL_SIZE, connect_timeout=DSS_CONNECT_TIMEOUT, read_timeout=DSS_READ_TIMEOUT,
+                 verify=DSS_CA_BUNDLE or DSS_VERIFY_TLS):
+        self.pool_size = pool_size
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.verify = verify
+        self.keepalive_interval = token_manager.keepalive_interval
+        self.update_token_interval = token_manager.update_token_interval
+        self.token = None
+        self._config = None
+        self._client = None
+        self._lock = None
+        self._tasks = []
+
+    @staticmethod
+    def _read_config():
+        return {
+            'host': get_host_dss_query()[0],
+            'port': get_port_dss_query()[0],
+            'user': get_user_dss_query()[0],
+            'endpoint': get_enpoint_access_record_dss_query()[0],
+        }
+
+    async def _get_config(self):
+        """Configuración del DSS leída en un hilo (sin bloquear el event loop) y guardada hasta close()."""
+        if self._config is None:
+            self._config = await asyncio.to_thread(self._read_config)
+        return self._config
+
+    async def _get_client(self):
+        if self._client is None:
+            config = await self._get_config()
+            if self._client is None:
+                self._client = httpx.AsyncClient(
+                    base_url=f'https://{config["host"]}:{config["port"]}',
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                    timeout=self.timeout,
+                    verify=self.verify,
+                )
+        return self._client
+
+    def _get_lock(self):
+        # El lock se crea dentro del event loop que lo usa
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def _request(self, method, path, **kwargs):
+        """
+        Envía la petición con el mismo circuit breaker que el cliente sincrónico: los errores de httpx
+        y las respuestas 5xx cuentan como fallas y con el circuito abierto se lanza CircuitOpenError.
+        """
+        client = await self._get_client()
+        dss_breaker.check()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            dss_breaker.record_failure(e)
+            raise
+        except BaseException:
+            # Cualquier otra excepción (o la cancelación de la tarea) libera la llamada de prueba
+            dss_breaker.release_probe()
+            raise
+        if response.status_code >= 500:
+            dss_breaker.record_failure(f'HTTP {response.status_code}')
+        else:
+            dss_breaker.record_success()
+        return response
+
+    async def _authorize(self, payload):
+        response = await self._request('POST', '/brms/api/v1.0/accounts/authorize', json=payload)
+        if not response.text.strip():
+            return {}
+        return response.json()
+
+    async def _authenticate(self):
+        """Autenticación en dos fases (realm/randomKey y luego la firma MD5)."""
+        user = (await self._get_config())['user']
+        first_auth_resp = await self._authorize({'userName': user, "clientType": "WINPC_V2"})
+        if "realm" not in first_auth_resp or "randomKey" not in first_auth_resp:
+            print("Error: No se pudo obtener realm o randomKey.")
+            return None
+        randomKey = first_auth_resp["randomKey"]
+        signature = await asyncio.to_thread(token_manager._get_signature, first_auth_resp["realm"], randomKey)
+        if not signature:
+            print("Error: No se pudo generar la firma.")
+            return None
+        auth_response = await self._authorize({
+            "userName": user,
+            "signature": signature,
+            "randomKey": randomKey,
+            "publicKey": first_auth_resp.get("publickey", ""),
+            "encryptType": "MD5",
+            "ipAddress": "",
+            "clientType": "WINPC_V2",
+            "userType": "0"
+        })
+        token = auth_response.get("accessToken") or auth_response.get("token")
+        if not token:
+            print("Error: No se recibió token de acceso.")
+        return token
+
+    async def get_token(self):
+        """Retorna el token vigente; se autentica si no hay uno (la validez la mantiene el keepalive)."""
+        async with self._get_lock():
+            if not self.token:
+                try:
+                    self.token = await self._authenticate()
+                except Exception as e:
+                    print("Error en la autenticación asíncrona con el DSS:", e)
+                    self.token = None
+            return self.token
+
+    async def keepalive(self):
+        """Envía un keepalive; si el DSS lo rechaza el token se descarta y se vuelve a autenticar."""
+        if not self.token:
+            return
+        try:
+            response = await self._request('PUT', '/brms/api/v1.0/accounts/keepalive',
+                                           headers={'X-Subject-Token': self.token}, content="{}")
+            if response.status_code != 200:
+                print("Keepalive asíncrono fallido:", response.status_code)
+                self.token = None
+        except Exception as e:
+            print("Error en keepalive asíncrono:", e)
+
+    async def update_token(self):
+        """Renueva el token de acceso."""
+        async with self._get_lock():
+            if not self.token:
+                return None
+            try:
+                signature = await asyncio.to_thread(token_manager._get_signature_for_update_token, self.token)
+                response = await self._request('POST', '/brms/api/v1.0/accounts/updateToken',
+                                               headers={'X-Subject-Token': self.token},
+                                               json={"signature": signature})
+                if response.status_code == 200:
+                    updated_token = response.json().get("data", {}).get("token")
+                    if updated_token:
+                        self.token = updated_token
+                        return updated_token
+                print("Error al actualizar el token asíncrono:", response.status_code)
+            except Exception as e:
+                print("Error en update_token asíncrono:", e)
+            return None
+
+    async def _periodic(self, interval, func):
+        while True:
+            await asyncio.sleep(interval)
+            await func()
+
+    def start(self):
+        """Programa keepalive y renovación del token en el event loop actual."""
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self._periodic(self.keepalive_interval, self.keepalive)),
+                asyncio.create_task(self._periodic(self.update_token_interval, self.update_token)),
+            ]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._config = None
+
+    async def fetch_page(self, page, pageSize, startTime, endTime, token=None, keep_raw=False):
+        """Versión asíncrona de fetch_access_control_records_page (mismo formato de respuesta)."""
+        token = token or await self.get_token()
+        headers = {
+            "X-Subject-Token": token or "",
+            "Content-Type": "application/json;charset=UTF-8",
+            "Accept-Language": "en"
+        }
+        payload = {"page": str(page), "pageSize": str(pageSize), "startTime": startTime, "endTime": endTime}
+        try:
+            endpoint = (await self._get_config())['endpoint']
+            response = await self._request('POST', endpoint, json=payload, headers=headers)
+            if response.status_code != 200:
+                print("Error en la solicitud:", response.status_code, response.text)
+                return {"error": f"Error {response.status_code}: {response.text}"}
+            try:
+                return normalize_access_records(response.json(), keep_raw)
+            except Exception as e:
+                print("Error al procesar los datos:", e)
+                traceback.print_exc()
+                return {"error": "No se pudo procesar la respuesta"}
+        except Exception as e:
+            print("Excepción durante la solicitud:", e)
+            return {"error": str(e)}
+
+    async def _fetch_page_with_retries(self, page, pageSize, startTime, endTime, token, semaphore=None, keep_raw=False):
+        data = None
+        for attempt in range(1, DSS_PAGE_RETRIES + 1):
+            if semaphore is None:
+                data = await self.fetch_page(page, pageSize, startTime, endTime, token, keep_raw)
+            else:
+                async with semaphore:
+                    data = await self.fetch_page(page, pageSize, startTime, endTime, token, keep_raw)
+            if data and "error" not in data:
+                return data
+            if attempt == DSS_PAGE_RETRIES or dss_breaker.state == 'open':
+                break
+            await asyncio.sleep(backoff_delay(attempt, DSS_PAGE_RETRY_DELAY))
+        return data
+
+    async def fetch_all_records(self, startTime, endTime, pageSize=None, workers=None, keep_raw=False):
+        """
+        Igual que fetch_all_access_control_records: primera página para totalCount, el resto
+        en paralelo (como máximo 'workers' a la vez) y unidas en orden de página.
+        """
+        pageSize = int(pageSize or DSS_PAGE_SIZE)
+        token = await self.get_token()
+        first = await self._fetch_page_with_retries(1, pageSize, startTime, endTime, token, keep_raw=keep_raw)
+        if not first or "error" in first:
+            return first
+
+        total = int(first["data"].get("totalCount") or 0)
+        pages = -(-total // pageSize)
+        semaphore = asyncio.Semaphore(workers or DSS_PAGE_WORKERS)
+        results = await asyncio.gather(*(
+            self._fetch_page_with_retries(page, pageSize, startTime, endTime, token, semaphore, keep_raw)
+            for page in range(2, pages + 1)
+        ))
+
+        missing = []
+        for page, data in enumerate(results, start=2):
+            if not data or "error" in data:
+                print(f'No se pudo obtener la página {page} de registros de acceso: {data.get("error") if data else data}')
+                missing.append(page)
+                continue
+            first["data"]["pageData"].extend(data["data"]["pageData"])
+        first["data"]["missingPages"] = missing
+        return first
+
+    async def _fetch_window(self, startTime, endTime, pageSize, token, min_window, semaphore, keep_raw=False):
+        """Versión asíncrona de _fetch_window de services.dahua: (respuesta, subventanas pendientes)."""
+        data = await self._fetch_page_with_retries(1, pageSize, startTime, endTime, token, semaphore, keep_raw)
+        if not data or "error" in data:
+            return data, []
+        total = int(data["data"].get("totalCount") or 0)
+        if total <= pageSize:
+            return data, []
+        if endTime - startTime > min_window:
+            middle = (startTime + endTime) // 2
+            return data, [(startTime, middle), (middle, endTime)]
+        for page in range(2, -(-total // pageSize) + 1):
+            page_data = await self._fetch_page_with_retries(page, pageSize, startTime, endTime, token, semaphore, keep_raw)
+            if not page_data or "error" in page_data:
+                return page_data, []
+            data["data"]["pageData"].extend(page_data["data"]["pageData"])
+        return data, []
+
+    async def fetch_records_range(self, startTime, endTime, window_hours=None, pageSize=None, workers=None,
+                                  min_window=None, keep_raw=False):
+        """
+        Igual que fetch_access_control_records_range: ventanas de 'window_hours' horas consultadas
+        en paralelo (como máximo 'workers' peticiones a la vez), las que exceden pageSize se dividen
+        hasta 'min_window' segundos y los registros se unen sin duplicados por identidad.
+
+        Retorna:
+          - Respuesta ordenada por alarmTime con data.missingWindows, o el diccionario de error
+            si no se pudo obtener ninguna ventana.
+        """
+        pageSize = int(pageSize or DSS_PAGE_SIZE)
+        min_window = min_window or DSS_RANGE_MIN_WINDOW
+        token = await self.get_token()
+        semaphore = asyncio.Semaphore(workers or DSS_RANGE_WORKERS)
+
+        def submit(start, end):
+            return asyncio.create_task(self._fetch_window(start, end, pageSize, token, min_window, semaphore, keep_raw))
+
+        records = {}
+        missing = []
+        result = error = None
+        pending = {submit(start, end): (start, end) for start, end in range_windows(startTime, endTime, window_hours)}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    bounds = pending.pop(task)
+                    try:
+                        data, subwindows = task.result()
+                    except Exception as e:
+                        data, subwindows = {"error": str(e)}, []
+                    if not data or "error" in data:
+                        print(f'No se pudo obtener la ventana {bounds} de registros de acceso: {data.get("error") if data else data}')
+                        missing.append(list(bounds))
+                        error = data
+                        continue
+                    for record in data["data"]["pageData"]:
+                        records.setdefault(record.identity, record)
+                    if result is None:
+                        result = data
+                    for start, end in subwindows:
+                        pending[submit(start, end)] = (start, end)
+        finally:
+            # Si la consulta se cancela no quedan ventanas descargándose en segundo plano
+            for task in pending:
+                task.cancel()
+
+        if result is None:
+            return error
+        return merge_range_result(result, records, missing)
+
+
+# Instancia global del cliente asíncrono del DSS
+dss_async_client = AsyncDssClient()
@@ -0,0 +1,100 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from database.db import get_host_dss_query, get_port_dss_query
+from services.resilience import CircuitBreaker
+
+# Cliente HTTP compartido para el servidor DSS (conexiones keep-alive reutilizadas entre llamadas)
+DSS_POOL_SIZE = int(os.getenv('DSS_POOL_SIZE', '10'))
+DSS_CONNECT_TIMEOUT = float(os.getenv('DSS_CONNECT_TIMEOUT', '5'))   # Segundos
+DSS_READ_TIMEOUT = float(os.getenv('DSS_READ_TIMEOUT', '60'))        # Segundos
+# TLS: el DSS usa un certificado autofirmado; DSS_CA_BUNDLE permite validarlo con su CA
+DSS_VERIFY_TLS = os.getenv('DSS_VERIFY_TLS', '0') == '1'
+DSS_CA_BUNDLE = os.getenv('DSS_CA_BUNDLE')
+
+
+def _notify_open(message):
+    # Un solo correo al abrir el circuito, no uno por cada ciclo fallido
+    from utils.mail import send_mail
+    send_mail(message)
+
+
+# Circuit breaker compartido por el cliente sincrónico y el asíncrono
+dss_breaker = CircuitBreaker('DSS', on_open=_notify_open)
+
+
+class DssClient:
+    """
+    Sesión requests compartida por todos los hilos para las llamadas al DSS.
+
+    El pool de conexiones del adaptador es thread-safe; con pool_block=True los hilos esperan
+    una conexión libre en lugar de abrir conexiones extra que luego se descartan.
+    """
+
+    def __init__(self, pool_size=DSS_POOL_SIZE, connect_timeout=DSS_CONNECT_TIMEOUT,
+                 read_timeout=DSS_READ_TIMEOUT, verify=DSS_CA_BUNDLE or DSS_VERIFY_TLS):
+        self.pool_size = pool_size
+        self.timeout = (connect_timeout, read_timeout)
+        self.verify = verify
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    session.verify = self.verify
+                    self._session = session
+        return self._session
+
+    @staticmethod
+    def base_url():
+        return f'https://{get_host_dss_query()[0]}:{get_port_dss_query()[0]}'
+
+    def request(self, method, path, **kwargs):
+        """
+        Envía la petición al DSS; path puede ser relativo al host configurado o una URL completa.
+
+        Los errores de requests (conexión, timeout, cuerpo cortado) y las respuestas 5xx cuentan como
+        fallas del circuit breaker; con el circuito abierto se lanza CircuitOpenError sin enviar la
+        petición. No reintenta: los reintentos con espera exponencial los hace quien consulta
+        (_fetch_page_with_retries y stream_access_control_records).
+        """
+        url = path if path.startswith('http') else self.base_url() + path
+        kwargs.setdefault('timeout', self.timeout)
+        dss_breaker.check()
+        try:
+            response = self._get_session().request(method, url, **kwargs)
+        except requests.RequestException as e:
+            dss_breaker.record_failure(e)
+            raise
+        except Exception:
+            # Cualquier otra excepción libera la llamada de prueba sin decidir el estado del circuito
+            dss_breaker.release_probe()
+            raise
+        if response.status_code >= 500:
+            dss_breaker.record_failure(f'HTTP {response.status_code}')
+        else:
+            dss_breaker.record_success()
+        return response
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def close(self):
+        with self._lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+
+# Instancia global del cliente DSS
+dss_client = DssClient()
@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+from database.db import get_employees_db, get_employees_changed_db, get_employee_directory_row_db, to_datetime
+
+# Cada cuánto se consultan los empleados modificados (change_time) y cuánto dura la caché negativa
+EMPLOYEE_REFRESH_INTERVAL = float(os.getenv('EMPLOYEE_REFRESH_INTERVAL', '300'))  # Segundos
+EMPLOYEE_NEGATIVE_TTL = float(os.getenv('EMPLOYEE_NEGATIVE_TTL', '3600'))         # Segundos
+
+
+class EmployeeDirectory:
+    """
+    Índice en memoria de personnel_employee: emp_code -> (id, first_name).
+
+    Se carga completo la primera vez y luego se refresca de forma incremental por change_time.
+    Los códigos que no existen quedan en caché negativa durante negative_ttl segundos para no
+    volver a consultarlos (ni registrarlos en empleados_sin_id.json) en cada ciclo.
+    """
+
+    def __init__(self, refresh_interval=EMPLOYEE_REFRESH_INTERVAL, negative_ttl=EMPLOYEE_NEGATIVE_TTL):
+        self.refresh_interval = refresh_interval
+        self.negative_ttl = negative_ttl
+        self._employees = {}
+        self._missing = {}            # emp_code -> instante de expiración
+        self._last_change_time = None
+        self._loaded = False
+        self._refreshed_at = float('-inf')
+        self._lock = threading.RLock()
+
+    def _apply(self, rows):
+        for emp_code, emp_id, first_name, change_time in rows:
+            emp_code = str(emp_code)
+            self._employees[emp_code] = (emp_id, first_name)
+            self._missing.pop(emp_code, None)
+            change_time = to_datetime(change_time)
+            if change_time is not None and (self._last_change_time is None or change_time > self._last_change_time):
+                self._last_change_time = change_time
+
+    def refresh(self, force=False):
+        """Carga completa la primera vez; después solo los empleados con change_time posterior."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._refreshed_at < self.refresh_interval:
+                return
+            self._refreshed_at = now
+
+            if not self._loaded or self._last_change_time is None:
+                # La carga completa se hace con el lock: los demás hilos esperan el directorio completo
+                rows = get_employees_db()
+                if rows is None:
+                    print('No se pudo cargar el directorio de empleados.')
+                    return
+                self._employees.clear()
+                self._apply(rows)
+                self._loaded = True
+                print(f'Directorio de empleados cargado: {len(self._employees)} empleados.')
+                return
+            last_change_time = self._last_change_time
+
+        # El refresco incremental se consulta sin el lock (los demás hilos siguen leyendo el índice)
+        rows = get_employees_changed_db(last_change_time)
+        if rows:
+            with self._lock:
+                self._apply(rows)
+
+    def is_missing(self, emp_code):
+        """Indica si el código está en la caché negativa (no existe y no se debe volver a consultar)."""
+        expires = self._missing.get(str(emp_code))
+        return expires is not None and expires > time.monotonic()
+
+    def get(self, emp_code):
+        """
+        Retorna (id, first_name) del empleado o None si no existe.
+        Un código desconocido se consulta una sola vez y queda en caché negativa.
+        """
+        if emp_code is None:
+            return None
+        emp_code = str(emp_code)
+        self.refresh()
+        with self._lock:
+            employee = self._employees.get(emp_code)
+            if employee is not None or self.is_missing(emp_code):
+                return employee
+
+        # La consulta se hace sin el lock para que un código desconocido no detenga a los demás hilos
+        rows = get_employee_directory_row_db(emp_code)
+        with self._lock:
+            if rows:
+                self._apply(rows)
+                return self._employees.get(emp_code)
+            if rows is not None:
+                self._missing[emp_code] = time.monotonic() + self.negative_ttl
+            return None
+
+    def update_name(self, emp_code, first_name):
+        """Actualiza el nombre en el índice después de un UPDATE en la base."""
+        with self._lock:
+            employee = self._employees.get(str(emp_code))
+            if employee is not None:
+                self._employees[str(emp_code)] = (employee[0], first_name)
+
+
+# Instancia global del directorio de empleados
+employee_directory = EmployeeDirectory()
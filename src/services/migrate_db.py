@@ -2,9 +2,25 @@ import json
 import os
 from fastapi import HTTPException
 from datetime import datetime, timedelta
-from database.db import (validate_log_acc_monitor_log, validate_log_iclock, insert_acc_monitor_log, get_last_log_time_acc_monitor_log, 
-                       get_last_log_time_iclock, insert_iclock, get_sn_db, get_emp_id_db, log_to_db, validate_log_acc_monitor_log_sj, 
-                       get_last_log_time_acc_monitor_log_sj, insert_acc_monitor_log_sj, get_employee_by_id, get_update_employee)
+from functools import partial
+from database.db import (get_existing_keys_acc_monitor_log, get_existing_keys_iclock, get_last_log_times_acc_monitor_log, 
+                       get_last_log_times_iclock, get_sn_db, log_to_db, get_existing_keys_acc_monitor_log_sj, 
+                       get_last_log_times_acc_monitor_log_sj, unit_of_work, insert_iclock_query, insert_acc_monitor_log_query,
+                       insert_acc_monitor_log_sj_query, update_employee_by_id_query, ping_db)
+from database.staging import merge_staged_rows
+from services.employee_directory import employee_directory
+from services.spool import spool_page
+
+# Modo de migración: 'row' (validación en Python e inserción en bloque) o 'staging'
+# (tabla temporal + INSERT...SELECT que deduplica y aplica la regla de 30 minutos en el servidor)
+MIGRATION_MODE = os.getenv('MIGRATION_MODE', 'row')
+
+# Registros por bloque cuando pageData es grande o un generador (lectura en streaming del DSS)
+MIGRATION_CHUNK_SIZE = int(os.getenv('MIGRATION_CHUNK_SIZE', '1000'))
+
+# Resultado de una página que no se migró pero quedó guardada en el spool local; la marca de agua
+# puede avanzar porque el spool la reproduce en los ciclos siguientes
+SPOOLED = 'spooled'
 
 def get_verify_type(pointName):
     try:
@@ -122,15 +138,17 @@ def guardar_emp_sin_id(emp_id, emp_name, filename="empleados_sin_id.json"):
 
 def get_emp_id(entry):
     try:
-        personId = entry.get('personId')
-        personName = entry.get('firstName')
+        personId = entry.personId
+        personName = entry.firstName
         # print(f'ID: {personId} - NOMBRE: {personName}')
-        rows = get_emp_id_db(personId)
-        for row in rows:
+        if employee_directory.is_missing(personId):
+            return None
+        employee = employee_directory.get(personId)
+        if employee is not None:
             if personId == '2287':
                 return 7777
-            elif row[0] is not None:
-                return row[0]
+            elif employee[0] is not None:
+                return employee[0]
             else:
                 print(f'El empleado: {personId} no tiene ID')
                 guardar_emp_sin_id(personId, personName)
@@ -181,11 +199,9 @@ def get_upload_time():
     
 def validate_employee(personId):
     try:
-        # Obtenemos los datos del empleado
-        employees = get_emp_id_db(personId)
-        if employees and not isinstance(employees, list):
-            employees = [employees]
-        return employees
+        # Obtenemos los datos del empleado desde el directorio en memoria
+        employee = employee_directory.get(personId)
+        return [(employee[0],)] if employee is not None else []
     except Exception as e: 
         print("Error al validar el empleado.")
         return False
@@ -211,13 +227,13 @@ def validate_department_employee(pointName):
 
 def get_emp_code_and_name(personId):
     try:
-        emp_list = get_employee_by_id(personId)
-        # print(f'Empleado obtenido: {emp_list}')
-        if emp_list and emp_list[0][0] == personId:
-            # Obtener la tupla
-            emp_code, emp_name = emp_list[0]
-            # print(f'El empleado es correcto: {emp_code} - {emp_name}')
-            return emp_code, emp_name
+        if employee_directory.is_missing(personId):
+            return None, None
+        employee = employee_directory.get(personId)
+        # print(f'Empleado obtenido: {employee}')
+        if employee is not None:
+            # print(f'El empleado es correcto: {personId} - {employee[1]}')
+            return personId, employee[1]
         else:
             print("El empleado no coincide o no se encontró.")
             return None, None
@@ -225,26 +241,156 @@ def get_emp_code_and_name(personId):
         print(f'Error al obtener el emp_code y el nombre: {e}')
         return None, None
 
-def migrate_db_iclock(data):
+def _page_keys(page_data):
+    """Claves (pin, time) de los registros de una página, para la validación de duplicados en bloque."""
+    keys = set()
+    for entry in page_data:
+        try:
+            keys.add((str(entry.personId), entry.punch_time))
+        except Exception:
+            continue
+    return keys
+
+def _page_pins(page_data, pointName=None):
+    """Pines de los registros de una página (opcionalmente solo los de un punto de acceso)."""
+    return {entry.personId for entry in page_data
+            if entry.personId is not None and (pointName is None or entry.pointName == pointName)}
+
+def _merge_page(target, rows):
+    """Migra las filas de la página con una sola sentencia set-based (modo 'staging')."""
+    cutoff = get_upload_time() - timedelta(seconds=1800)
+    result = merge_staged_rows(target, rows, cutoff)
+    if result is not None:
+        print(f'Migración {target} por tabla temporal: {result["inserted"]} insertados, '
+              f'{result["duplicates"]} duplicados y {result["rejected"]} rechazados de {result["staged"]}.')
+    return result
+
+def _commit_cycle(db_id, target, insert_query, rows, employee_updates=None):
+    """
+    Inserta las filas aceptadas del ciclo y actualiza los nombres de empleados en una sola
+    unidad de trabajo (una conexión y un commit por sub-lote).
+
+    Retorna:
+      - True si todas las sentencias quedaron confirmadas, False si alguna se descartó.
+    """
+    employee_updates = employee_updates or {}
+    if not rows and not employee_updates:
+        return True
+    with unit_of_work(db_id) as uow:
+        for emp_code, first_name in employee_updates.items():
+            uow.add(update_employee_by_id_query, (first_name, emp_code),
+                    on_commit=partial(employee_directory.update_name, emp_code, first_name))
+        for row in rows:
+            uow.add(insert_query, row)
+    print(f'Ciclo {target} confirmado: {uow.applied} sentencias aplicadas y {uow.failed} descartadas '
+          f'({len(rows)} registros, {len(employee_updates)} empleados actualizados).')
+    if not uow.complete:
+        message = f'Ciclo {target}: {uow.failed} sentencias no se pudieron confirmar'
+        print(message)
+        log_to_db(db_id, 1, 'ERROR', message, '_commit_cycle', 409)
+    return uow.complete
+
+def _spooled(spooled):
+    """SPOOLED si la página quedó guardada en el spool local, None si tampoco se pudo guardar."""
+    return SPOOLED if spooled is not None else None
+
+def _spool_data(target, data, pointName=None):
+    """Guarda en el spool local los registros de la página (opcionalmente solo los de un punto de acceso)."""
+    try:
+        page_data = data["data"]["pageData"]
+    except Exception:
+        return None
+    if pointName is not None:
+        page_data = [entry for entry in page_data if entry.pointName == pointName]
+    return spool_page(target, page_data)
+
+def iter_chunks(records, size=None):
+    """Agrupa un iterable (lista o generador) en listas de como máximo 'size' registros."""
+    size = size or MIGRATION_CHUNK_SIZE
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _migrate_chunks(migrate_page, data, spool):
+    """
+    Migra pageData. Una lista se migra completa en un solo ciclo; un generador (lectura en streaming
+    del DSS) se migra por bloques de MIGRATION_CHUNK_SIZE para que la memoria no dependa del tamaño
+    de la respuesta. Cada bloque valida duplicados contra lo que confirmaron los anteriores (lectura del primario).
+
+    Retorna:
+      - True si todos los bloques se migraron, SPOOLED si los que fallaron quedaron en el spool local,
+        None si alguno no se migró ni se guardó y False si no hay 'pageData'.
+    """
+    page_data = data.get("data", {}).get("pageData") if isinstance(data, dict) else None
+    if page_data is None or isinstance(page_data, (list, tuple)):
+        return migrate_page(data, spool)
+
+    result = True
+    try:
+        for chunk in iter_chunks(page_data):
+            chunk_result = migrate_page({"data": {"pageData": chunk}}, spool)
+            if chunk_result == SPOOLED and result is True:
+                result = SPOOLED
+            elif chunk_result is not True and chunk_result != SPOOLED:
+                result = None
+    except Exception as e:
+        # Error al leer el generador (por ejemplo, la respuesta del DSS se cortó); los bloques previos ya quedaron migrados
+        print(f'Error al leer los registros por bloques: {e}')
+        return None
+    return result
+
+def _most_recent(*values):
+    """Retorna el mayor de los datetime no nulos, o None."""
+    return max((value for value in values if value is not None), default=None)
+
+def _migrate_iclock_page(data, spool=True):
     try:
         print('')
         # Verificamos si 'pageData' está presente en los datos
         if "data" in data and "pageData" in data["data"]:
-            for i, entry in enumerate(data["data"]["pageData"]):
-                print(f'Migrando datos iclock {i+1}/{len(data["data"]["pageData"])}')
-
-                personId = entry.get("personId")
-                pointName = entry.get('pointName')
-                firstName = entry.get('firstName')
-
-                # Convertir alarmTime a objeto datetime y luego formatearlo
-                alarm_time_str = entry.get("alarmTime")
-                try:
-                    alarm_time_obj = datetime.strptime(alarm_time_str, "%Y-%m-%d %H:%M:%S")
-                    fecha_bio_val = datetime.strptime(alarm_time_str, "%Y-%m-%d %H:%M:%S").date()
-                except Exception as e:
-                    print(f'Error al convertir alarmTime: {alarm_time_str}, {e}')
+            # Filas aceptadas en este ciclo; se insertan en bloque al final
+            page_data = data["data"]["pageData"]
+            staging = MIGRATION_MODE == 'staging'
+
+            # Si la base no responde la página se guarda en el spool local y se reproduce en otro ciclo
+            if spool and not ping_db(2):
+                return _spooled(_spool_data('iclock', data))
+
+            if not staging:
+                # Claves (pin, time) ya registradas; se consultan una sola vez para toda la página
+                existing_keys = get_existing_keys_iclock(_page_keys(page_data))
+                if existing_keys is None:
+                    print('No se pudo validar duplicados para la página iclock; se guarda en el spool.')
+                    return _spooled(_spool_data('iclock', data)) if spool else None
+
+                # Último registro de cada empleado de la página; se actualiza al aceptar filas
+                last_times = get_last_log_times_iclock(_page_pins(page_data))
+                if last_times is None:
+                    print('No se pudo obtener el último registro de los empleados (iclock); se guarda en el spool.')
+                    return _spooled(_spool_data('iclock', data)) if spool else None
+
+            rows_to_insert = []
+            # Nombres de empleados que cambiaron; se actualizan en la misma transacción del ciclo
+            employee_updates = {}
+
+            for i, entry in enumerate(page_data):
+                print(f'Migrando datos iclock {i+1}/{len(page_data)}')
+
+                personId = entry.personId
+                pointName = entry.pointName
+                firstName = entry.firstName
+
+                # Hora local del marcaje a partir de alarmTime (segundos UTC)
+                alarm_time_obj = entry.punch_time
+                if alarm_time_obj is None:
+                    print(f'Registro {entry.id} sin alarmTime; se omite.')
                     continue
+                fecha_bio_val = alarm_time_obj.date()
 
                 time_val = alarm_time_obj
                 punch_state = '0'
@@ -288,48 +434,50 @@ def migrate_db_iclock(data):
 
                 try:
                     empcode_, firstName_ = get_emp_code_and_name(personId)
-                    if empcode_ == personId:
+                    if empcode_ == personId and firstName_ != firstName:
                         # print(f'El empleado es correcto: {firstName_}')
-                        get_update_employee(firstName, personId)
+                        # Solo se actualiza cuando el nombre cambió
+                        employee_updates[personId] = firstName
 
                 except Exception as e:
                     print(f'Ocurrio un error al obtener el empleado {e}')
                     continue
 
-                try:
-                    # Validar si ya existe un registro con el mismo time y pin en acc_monitor_log_dev
-                    if not validate_log_iclock(2, alarm_time_obj, list_data_iclock_transaction[0]):
-                        last_log_time = get_last_log_time_iclock(personId)
-                        # print(f'Fecha del colaborador {personId} obtenido para last_log_time y validacion: {last_log_time}')
-                        if last_log_time:
-                            # Extraer el valor del primer registro y la primera columna
-                            if isinstance(last_log_time, list) and len(last_log_time) > 0:
-                                last_log_time_value = last_log_time[0][0]
-                            else:
-                                last_log_time_value = last_log_time[0]  # En caso de que no sea una lista de tuplas
-
-                            # Si el valor es una cadena, conviértelo a datetime
-                            if isinstance(last_log_time_value, str):
-                                last_log_time_value = datetime.strptime(last_log_time_value, "%Y-%m-%d %H:%M:%S")
-                            
-                            # print(f'Fecha del colaborador {personId} procesado: {last_log_time_value}')
-                            if last_log_time_value is not None:
-                                time_diff = upload_time - last_log_time_value
-                                if time_diff.total_seconds() < 1800:
-                                    print(f'Registro rechazado clock para pin: {personId}. Ya existe un registro en los últimos 30 minutos.')
-                                    continue
-                                else:
-                                    # Manejar el caso en que no se encontró un last_log_time válido.
-                                    print(f'No se encontró un último log válido para el empleado {personId}.')
+                if staging:
+                    # La deduplicación y la regla de 30 minutos se aplican en el servidor
+                    rows_to_insert.append(tuple(list_data_iclock_transaction))
+                    continue
 
-                        insert_iclock(list_data_iclock_transaction)
-                        print('Log insertado correctamente.')
+                try:
+                    # Validar si ya existe un registro con el mismo time y pin (en la base o en este ciclo)
+                    key = (str(personId), alarm_time_obj)
+                    if key not in existing_keys:
+                        last_log_time_value = last_times.get(str(personId))
+                        # print(f'Fecha del colaborador {personId} procesado: {last_log_time_value}')
+                        if last_log_time_value is not None:
+                            time_diff = upload_time - last_log_time_value
+                            if time_diff.total_seconds() < 1800:
+                                print(f'Registro rechazado clock para pin: {personId}. Ya existe un registro en los últimos 30 minutos.')
+                                continue
+
+                        rows_to_insert.append(tuple(list_data_iclock_transaction))
+                        existing_keys.add(key)
+                        last_times[str(personId)] = _most_recent(last_times.get(str(personId)), alarm_time_obj)
                     else:
                         print(f'Registro iclock duplicado encontrado para time: {list_data_iclock_transaction[1]} y pin: {list_data_iclock_transaction[0]}')
                 except Exception as e:
-                    print(f'Error al insertar iclock, {e}')
+                    print(f'Error al validar iclock, {e}')
 
-            return True
+            # True solo si todas las filas quedaron escritas; si no, SPOOLED cuando la página quedó en el spool
+            if rows_to_insert and staging:
+                merged = _merge_page('iclock', rows_to_insert) is not None
+                completed = _commit_cycle(2, 'iclock', insert_iclock_query, [], employee_updates) and merged
+            else:
+                completed = _commit_cycle(2, 'iclock', insert_iclock_query, rows_to_insert, employee_updates)
+            if completed:
+                return True
+            # Filas descartadas: la página se reproduce desde el spool (lo ya escrito se descarta como duplicado)
+            return _spooled(_spool_data('iclock', data)) if spool else None
         else:
             print("No se encontraron datos en 'pageData'.")
             return False
@@ -338,31 +486,52 @@ def migrate_db_iclock(data):
         message = f'Error en la petición HTTP, {http_ex}'
         print(message)
         log_to_db(2, 1, 'ERROR', message, 'migrate_db', http_ex.status_code)
-        return None
+        return _spooled(_spool_data('iclock', data)) if spool else None
 
     except Exception as e:
         message = f'Error al migrar datos a la base de datos, {e}'
         print(message)
         log_to_db(2, 1, 'ERROR', message, 'migrate_db', 409)
-        return None
+        return _spooled(_spool_data('iclock', data)) if spool else None
 
-def migrate_db_acc_manager_log(data):
+def _migrate_acc_manager_log_page(data, spool=True):
     try:
         print('')
         # Verificamos si 'pageData' está presente en los datos
         if "data" in data and "pageData" in data["data"]:
-            for i, entry in enumerate(data["data"]["pageData"]):
-                print(f'Migrando datos acc_monitor_log {i+1}/{len(data["data"]["pageData"])}')
-
-                personId = entry.get("personId")
-                pointName = entry.get('pointName')
-
-                # Convertir alarmTime a objeto datetime y luego formatearlo
-                alarm_time_str = entry.get("alarmTime")
-                try:
-                    alarm_time_obj = datetime.strptime(alarm_time_str, "%Y-%m-%d %H:%M:%S")
-                except Exception as e:
-                    print(f'Error al convertir alarmTime: {alarm_time_str}, {e}')
+            # Filas aceptadas en este ciclo; se insertan en bloque al final
+            page_data = data["data"]["pageData"]
+            staging = MIGRATION_MODE == 'staging'
+
+            # Si la base no responde la página se guarda en el spool local y se reproduce en otro ciclo
+            if spool and not ping_db(1):
+                return _spooled(_spool_data('acc_monitor_log', data, "B_Comedor_MH_Door1"))
+
+            if not staging:
+                # Claves (pin, time) ya registradas; se consultan una sola vez para toda la página
+                existing_keys = get_existing_keys_acc_monitor_log(_page_keys(page_data))
+                if existing_keys is None:
+                    print('No se pudo validar duplicados para la página acc_monitor_log; se guarda en el spool.')
+                    return _spooled(_spool_data('acc_monitor_log', data, "B_Comedor_MH_Door1")) if spool else None
+
+                # Último registro de cada empleado de la página; se actualiza al aceptar filas
+                last_times = get_last_log_times_acc_monitor_log(_page_pins(page_data, "B_Comedor_MH_Door1"))
+                if last_times is None:
+                    print('No se pudo obtener el último registro de los empleados (acc_monitor_log); se guarda en el spool.')
+                    return _spooled(_spool_data('acc_monitor_log', data, "B_Comedor_MH_Door1")) if spool else None
+
+            rows_to_insert = []
+
+            for i, entry in enumerate(page_data):
+                print(f'Migrando datos acc_monitor_log {i+1}/{len(page_data)}')
+
+                personId = entry.personId
+                pointName = entry.pointName
+
+                # Hora local del marcaje a partir de alarmTime (segundos UTC)
+                alarm_time_obj = entry.punch_time
+                if alarm_time_obj is None:
+                    print(f'Registro {entry.id} sin alarmTime; se omite.')
                     continue
 
                 status = 200
@@ -390,45 +559,49 @@ def migrate_db_acc_manager_log(data):
                     event_point_name
                 ]
 
-                # Validar si ya existe un registro con el mismo time y pin en acc_monitor_log_dev
-                if not validate_log_acc_monitor_log(1, alarm_time_obj, list_data[2]):
+                if staging:
+                    # La deduplicación y la regla de 30 minutos se aplican en el servidor
+                    if pointName == "B_Comedor_MH_Door1" and personId is not None:
+                        rows_to_insert.append(tuple(list_data))
+                    else:
+                        print(f'Dispositivo {pointName} no válido.')
+                    continue
+
+                # Validar si ya existe un registro con el mismo time y pin (en la base o en este ciclo)
+                key = (str(personId), alarm_time_obj)
+                if key not in existing_keys:
                     try:
                         if pointName == "B_Comedor_MH_Door1" and personId is not None:
-                            last_log_time = get_last_log_time_acc_monitor_log(personId)
-                            if last_log_time:
-                                # Extraer el valor del primer registro y la primera columna
-                                if isinstance(last_log_time, list) and len(last_log_time) > 0:
-                                    last_log_time_value = last_log_time[0][0]
-                                else:
-                                    last_log_time_value = last_log_time[0]  # En caso de que no sea una lista de tuplas
-
-                                # Si el valor es una cadena, conviértelo a datetime
-                                if isinstance(last_log_time_value, str):
-                                    last_log_time_value = datetime.strptime(last_log_time_value, "%Y-%m-%d %H:%M:%S")
-
-                                # print(f'Fecha del colaborador {personId} procesado: {last_log_time_value}')
-                                date_now = get_upload_time()
-                                if last_log_time_value is not None:
-                                    time_diff = date_now - last_log_time_value
-                                    if time_diff.total_seconds() < 1800:
-                                        print(f'Registro rechazado acc manager log para pin: {personId}. Ya existe un registro en los últimos 30 minutos.')
-                                        continue
-                                    else:
-                                        # Manejar el caso en que no se encontró un last_log_time válido.
-                                        print(f'No se encontró un último log válido para el empleado {personId}.')
+                            last_log_time_value = last_times.get(str(personId))
+                            # print(f'Fecha del colaborador {personId} procesado: {last_log_time_value}')
+                            date_now = get_upload_time()
+                            if last_log_time_value is not None:
+                                time_diff = date_now - last_log_time_value
+                                if time_diff.total_seconds() < 1800:
+                                    print(f'Registro rechazado acc manager log para pin: {personId}. Ya existe un registro en los últimos 30 minutos.')
+                                    continue
                             
-                            # Insertar el log en la base de datos
-                            insert_acc_monitor_log(list_data)
-                            # print('Datos migrados correctamente.')
+                            # Acumular el log para la inserción en bloque
+                            rows_to_insert.append(tuple(list_data))
+                            existing_keys.add(key)
+                            last_times[str(personId)] = _most_recent(last_times.get(str(personId)), alarm_time_obj)
                         else:
                             print(f'Dispositivo {pointName} no válido.')
                             continue
                     except Exception as e:
-                        print(f'Error al insertar log de monitorización, {e}')
+                        print(f'Error al validar log de monitorización, {e}')
                 else:
                     print(f'Registro log monitor duplicado encontrado para time: {list_data[1]} y pin: {list_data[2]}')
 
-            return True
+            # True solo si todas las filas quedaron escritas; si no, SPOOLED cuando la página quedó en el spool
+            if rows_to_insert and staging:
+                completed = _merge_page('acc_monitor_log', rows_to_insert) is not None
+            else:
+                completed = _commit_cycle(1, 'acc_monitor_log', insert_acc_monitor_log_query, rows_to_insert)
+            if completed:
+                return True
+            # Filas descartadas: la página se reproduce desde el spool (lo ya escrito se descarta como duplicado)
+            return _spooled(_spool_data('acc_monitor_log', data, "B_Comedor_MH_Door1")) if spool else None
         else:
             print("No se encontraron datos en 'pageData'.")
             return False
@@ -437,31 +610,52 @@ def migrate_db_acc_manager_log(data):
         message = f'Error en la petición HTTP, {http_ex}'
         print(message)
         log_to_db(1, 1, 'ERROR', message, 'migrate_db', http_ex.status_code)
-        return None
+        return _spooled(_spool_data('acc_monitor_log', data, "B_Comedor_MH_Door1")) if spool else None
 
     except Exception as e:
         message = f'Error al migrar datos a la base de datos, {e}'
         print(message)
         log_to_db(1, 1, 'ERROR', message, 'migrate_db', 409)
-        return None
+        return _spooled(_spool_data('acc_monitor_log', data, "B_Comedor_MH_Door1")) if spool else None
 
-def migrate_db_data_sj(data):
+def _migrate_data_sj_page(data, spool=True):
     try:
         print('')
         # Verificamos si 'pageData' está presente en los datos
         if "data" in data and "pageData" in data["data"]:
-            for i, entry in enumerate(data["data"]["pageData"]):
-                print(f'Migrando datos sj {i+1}/{len(data["data"]["pageData"])}')
-
-                personId = entry.get("personId")
-                pointName = entry.get('pointName')
-
-                # Convertir alarmTime a objeto datetime y luego formatearlo
-                alarm_time_str = entry.get("alarmTime")
-                try:
-                    alarm_time_obj = datetime.strptime(alarm_time_str, "%Y-%m-%d %H:%M:%S")
-                except Exception as e:
-                    print(f'Error al convertir alarmTime: {alarm_time_str}, {e}')
+            # Filas aceptadas en este ciclo; se insertan en bloque al final
+            page_data = data["data"]["pageData"]
+            staging = MIGRATION_MODE == 'staging'
+
+            # Si la base no responde la página se guarda en el spool local y se reproduce en otro ciclo
+            if spool and not ping_db(1):
+                return _spooled(_spool_data('acc_monitor_log_sj', data, "B_Comedor_A4_Door1"))
+
+            if not staging:
+                # Claves (pin, time) ya registradas; se consultan una sola vez para toda la página
+                existing_keys = get_existing_keys_acc_monitor_log_sj(_page_keys(page_data))
+                if existing_keys is None:
+                    print('No se pudo validar duplicados para la página sj; se guarda en el spool.')
+                    return _spooled(_spool_data('acc_monitor_log_sj', data, "B_Comedor_A4_Door1")) if spool else None
+
+                # Último registro de cada empleado de la página; se actualiza al aceptar filas
+                last_times = get_last_log_times_acc_monitor_log_sj(_page_pins(page_data, "B_Comedor_A4_Door1"))
+                if last_times is None:
+                    print('No se pudo obtener el último registro de los empleados (sj); se guarda en el spool.')
+                    return _spooled(_spool_data('acc_monitor_log_sj', data, "B_Comedor_A4_Door1")) if spool else None
+
+            rows_to_insert = []
+
+            for i, entry in enumerate(page_data):
+                print(f'Migrando datos sj {i+1}/{len(page_data)}')
+
+                personId = entry.personId
+                pointName = entry.pointName
+
+                # Hora local del marcaje a partir de alarmTime (segundos UTC)
+                alarm_time_obj = entry.punch_time
+                if alarm_time_obj is None:
+                    print(f'Registro {entry.id} sin alarmTime; se omite.')
                     continue
 
                 status = 200
@@ -489,45 +683,49 @@ def migrate_db_data_sj(data):
                     event_point_name
                 ]
 
-                # Validar si ya existe un registro con el mismo time y pin en acc_monitor_log_dev
-                if not validate_log_acc_monitor_log_sj(1, alarm_time_obj, list_data[2]):
+                if staging:
+                    # La deduplicación y la regla de 30 minutos se aplican en el servidor
+                    if pointName == "B_Comedor_A4_Door1" and personId is not None:
+                        rows_to_insert.append(tuple(list_data))
+                    else:
+                        print(f'Dispositivo {pointName} no válido.')
+                    continue
+
+                # Validar si ya existe un registro con el mismo time y pin (en la base o en este ciclo)
+                key = (str(personId), alarm_time_obj)
+                if key not in existing_keys:
                     try:
                         if pointName == "B_Comedor_A4_Door1" and personId is not None:
-                            last_log_time = get_last_log_time_acc_monitor_log_sj(personId)
-                            if last_log_time:
-                                # Extraer el valor del primer registro y la primera columna
-                                if isinstance(last_log_time, list) and len(last_log_time) > 0:
-                                    last_log_time_value = last_log_time[0][0]
-                                else:
-                                    last_log_time_value = last_log_time[0]  # En caso de que no sea una lista de tuplas
-
-                                # Si el valor es una cadena, conviértelo a datetime
-                                if isinstance(last_log_time_value, str):
-                                    last_log_time_value = datetime.strptime(last_log_time_value, "%Y-%m-%d %H:%M:%S")
-
-                                # print(f'Fecha del colaborador {personId} procesado: {last_log_time_value}')
-                                date_now = get_upload_time()
-                                if last_log_time_value is not None:
-                                    time_diff = date_now - last_log_time_value
-                                    if time_diff.total_seconds() < 1800:
-                                        print(f'Registro rechazado acc manager log para pin: {personId}. Ya existe un registro en los últimos 30 minutos.')
-                                        continue
-                                    else:
-                                        # Manejar el caso en que no se encontró un last_log_time válido.
-                                        print(f'No se encontró un último log válido para el empleado {personId}.')
+                            last_log_time_value = last_times.get(str(personId))
+                            # print(f'Fecha del colaborador {personId} procesado: {last_log_time_value}')
+                            date_now = get_upload_time()
+                            if last_log_time_value is not None:
+                                time_diff = date_now - last_log_time_value
+                                if time_diff.total_seconds() < 1800:
+                                    print(f'Registro rechazado acc manager log para pin: {personId}. Ya existe un registro en los últimos 30 minutos.')
+                                    continue
                             
-                            # Insertar el log en la base de datos
-                            insert_acc_monitor_log_sj(list_data)
-                            # print('Datos migrados correctamente.')
+                            # Acumular el log para la inserción en bloque
+                            rows_to_insert.append(tuple(list_data))
+                            existing_keys.add(key)
+                            last_times[str(personId)] = _most_recent(last_times.get(str(personId)), alarm_time_obj)
                         else:
                             print(f'Dispositivo {pointName} no válido.')
                             continue
                     except Exception as e:
-                        print(f'Error al insertar log de monitorización, {e}')
+                        print(f'Error al validar log de monitorización, {e}')
                 else:
                     print(f'Registro log monitor duplicado encontrado para time: {list_data[1]} y pin: {list_data[2]}')
 
-            return True
+            # True solo si todas las filas quedaron escritas; si no, SPOOLED cuando la página quedó en el spool
+            if rows_to_insert and staging:
+                completed = _merge_page('acc_monitor_log_sj', rows_to_insert) is not None
+            else:
+                completed = _commit_cycle(1, 'acc_monitor_log_sj', insert_acc_monitor_log_sj_query, rows_to_insert)
+            if completed:
+                return True
+            # Filas descartadas: la página se reproduce desde el spool (lo ya escrito se descarta como duplicado)
+            return _spooled(_spool_data('acc_monitor_log_sj', data, "B_Comedor_A4_Door1")) if spool else None
         else:
             print("No se encontraron datos en 'pageData'.")
             return False
@@ -536,10 +734,22 @@ def migrate_db_data_sj(data):
         message = f'Error en la petición HTTP, {http_ex}'
         print(message)
         log_to_db(1, 1, 'ERROR', message, 'migrate_db', http_ex.status_code)
-        return None
+        return _spooled(_spool_data('acc_monitor_log_sj', data, "B_Comedor_A4_Door1")) if spool else None
 
     except Exception as e:
         message = f'Error al migrar datos a la base de datos, {e}'
         print(message)
         log_to_db(1, 1, 'ERROR', message, 'migrate_db', 409)
-        return None
+        return _spooled(_spool_data('acc_monitor_log_sj', data, "B_Comedor_A4_Door1")) if spool else None
+
+def migrate_db_iclock(data, spool=True):
+    """Migra a iclock_transaction; spool=False al reproducir el spool local."""
+    return _migrate_chunks(_migrate_iclock_page, data, spool)
+
+def migrate_db_acc_manager_log(data, spool=True):
+    """Migra a acc_monitor_log; spool=False al reproducir el spool local."""
+    return _migrate_chunks(_migrate_acc_manager_log_page, data, spool)
+
+def migrate_db_data_sj(data, spool=True):
+    """Migra a acc_monitor_log_sj; spool=False al reproducir el spool local."""
+    return _migrate_chunks(_migrate_data_sj_page, data, spool)
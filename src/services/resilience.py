@@ -0,0 +1,126 @@
+import os
+import random
+import threading
+import time
+
+# Reintentos con espera exponencial y circuit breaker para las llamadas al DSS
+DSS_BACKOFF_BASE = float(os.getenv('DSS_BACKOFF_BASE', '0.5'))             # Segundos
+DSS_BACKOFF_MAX = float(os.getenv('DSS_BACKOFF_MAX', '10'))                # Segundos
+DSS_BREAKER_THRESHOLD = int(os.getenv('DSS_BREAKER_THRESHOLD', '5'))       # Fallas consecutivas para abrir
+DSS_BREAKER_COOLDOWN = float(os.getenv('DSS_BREAKER_COOLDOWN', '60'))      # Segundos abierto antes de probar
+
+
+class CircuitOpenError(ConnectionError):
+    """El circuito está abierto: la llamada no se envía hasta que termine el enfriamiento."""
+
+
+def backoff_delay(attempt, base=DSS_BACKOFF_BASE, max_delay=DSS_BACKOFF_MAX):
+    """Espera antes del reintento 'attempt' (1, 2, ...): exponencial con jitter completo."""
+    return random.uniform(0, min(max_delay, base * 2 ** (attempt - 1)))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker de tres estados (closed, open, half_open).
+
+    Tras 'threshold' fallas consecutivas el circuito se abre y las llamadas fallan de inmediato
+    durante 'cooldown' segundos; después se deja pasar una sola llamada de prueba: si responde
+    el circuito se cierra y si falla vuelve a abrirse. Si la prueba termina sin registrar resultado
+    (release_probe) o no termina en 'cooldown' segundos, se permite otra llamada de prueba.
+    """
+
+    def __init__(self, name, threshold=DSS_BREAKER_THRESHOLD, cooldown=DSS_BREAKER_COOLDOWN, on_open=None):
+        self.name = name
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.on_open = on_open
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self.opened_count = 0
+        self.rejected = 0
+        self.last_error = None
+        self._probe_in_flight = False
+        self._probe_started = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Indica si la llamada puede enviarse; en half_open solo pasa una llamada de prueba."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == 'open' and now - self.opened_at >= self.cooldown:
+                self.state = 'half_open'
+                self._probe_in_flight = False
+            # Una prueba que no terminó en 'cooldown' segundos se da por perdida
+            if self._probe_in_flight and now - self._probe_started >= self.cooldown:
+                self._probe_in_flight = False
+            if self.state == 'closed' or (self.state == 'half_open' and not self._probe_in_flight):
+                if self.state == 'half_open':
+                    self._probe_in_flight = True
+                    self._probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self):
+        """Lanza CircuitOpenError si el circuito no permite la llamada."""
+        if not self.allow():
+            raise CircuitOpenError(f'Circuito {self.name} abierto; se reintentará en {self.remaining():.0f} s')
+
+    def record_success(self):
+        with self._lock:
+            if self.state != 'closed':
+                print(f'Circuito {self.name} cerrado: el servicio volvió a responder.')
+            self.state = 'closed'
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self.last_error = str(error) if error is not None else None
+            self._probe_in_flight = False
+            if self.state == 'half_open' or (self.state == 'closed' and self.failures >= self.threshold):
+                opened = self.state == 'closed'
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+                self.opened_count += 1
+            else:
+                opened = False
+        if opened:
+            message = f'Circuito {self.name} abierto tras {self.failures} fallas consecutivas: {error}'
+            print(message)
+            if self.on_open:
+                try:
+                    self.on_open(message)
+                except Exception as e:
+                    print(f'Error al notificar la apertura del circuito {self.name}: {e}')
+
+    def release_probe(self):
+        """Libera la llamada de prueba en curso sin cambiar el estado (la llamada no registró resultado)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def remaining(self):
+        """Segundos que faltan para que se permita la próxima llamada (0 si se permite ya)."""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == 'open':
+                return max(self.cooldown - (now - self.opened_at), 0)
+            if self.state == 'half_open' and self._probe_in_flight:
+                return max(self.cooldown - (now - self._probe_started), 0)
+            return 0
+
+    def snapshot(self):
+        remaining = self.remaining()
+        with self._lock:
+            return {
+                'state': self.state,
+                'failures': self.failures,
+                'threshold': self.threshold,
+                'cooldown': self.cooldown,
+                'retry_in': round(remaining, 1),
+                'opened_count': self.opened_count,
+                'rejected': self.rejected,
+                'last_error': self.last_error,
+            }
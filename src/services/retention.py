@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from database.backends import get_backend
+from database.db import get_db_connection, log_to_db, DB_CONFIG
+
+# Retención de Logs_Info: antigüedad máxima, tamaño de cada lote y pausa entre lotes
+LOGS_RETENTION_DAYS = int(os.getenv('LOGS_RETENTION_DAYS', '30'))
+LOGS_RETENTION_BATCH_SIZE = int(os.getenv('LOGS_RETENTION_BATCH_SIZE', '1000'))
+LOGS_RETENTION_PAUSE = float(os.getenv('LOGS_RETENTION_PAUSE', '0.5'))            # Segundos
+LOGS_RETENTION_MAX_BATCHES = int(os.getenv('LOGS_RETENTION_MAX_BATCHES', '500'))  # Por base y ejecución
+LOGS_RETENTION_INTERVAL = int(os.getenv('LOGS_RETENTION_INTERVAL', '3600'))       # Segundos
+# 'delete' elimina las filas; 'archive' las mueve a Logs_Info_Archivo
+LOGS_RETENTION_MODE = os.getenv('LOGS_RETENTION_MODE', 'delete')
+
+_LOG_COLUMNS = '[id_group], [log_time], [log_level], [message], [endpoint], [status_code]'
+
+# Sentencias por motor; 'params' indica el orden de los parámetros ('batch' y 'cutoff').
+# Cada lote es una transacción corta para no mantener bloqueos sobre la tabla mientras se insertan logs.
+RETENTION_SQL = {
+    'mssql': {
+        'params': ('batch', 'cutoff'),
+        'delete': ["""DELETE TOP (?) FROM [dbo].[Logs_Info] WHERE [log_time] < ?"""],
+        'archive_table': f"""IF OBJECT_ID('dbo.Logs_Info_Archivo', 'U') IS NULL
+    SELECT TOP 0 {_LOG_COLUMNS} INTO [dbo].[Logs_Info_Archivo] FROM [dbo].[Logs_Info]""",
+        'archive': [f"""DELETE TOP (?) FROM [dbo].[Logs_Info]
+OUTPUT {', '.join('DELETED.' + column for column in _LOG_COLUMNS.split(', '))}
+INTO [dbo].[Logs_Info_Archivo] ({_LOG_COLUMNS})
+WHERE [log_time] < ?"""],
+    },
+    'sqlite': {
+        'params': ('cutoff', 'batch'),
+        'delete': ["""DELETE FROM [Logs_Info] WHERE [id] IN (
+    SELECT [id] FROM [Logs_Info] WHERE [log_time] < ? ORDER BY [id] LIMIT ?)"""],
+        'archive_table': f"""CREATE TABLE IF NOT EXISTS [Logs_Info_Archivo] AS SELECT {_LOG_COLUMNS} FROM [Logs_Info] WHERE 0""",
+        'archive': [f"""INSERT INTO [Logs_Info_Archivo] ({_LOG_COLUMNS}) SELECT {_LOG_COLUMNS} FROM [Logs_Info] WHERE [id] IN (
+    SELECT [id] FROM [Logs_Info] WHERE [log_time] < ? ORDER BY [id] LIMIT ?)""",
+                    """DELETE FROM [Logs_Info] WHERE [id] IN (
+    SELECT [id] FROM [Logs_Info] WHERE [log_time] < ? ORDER BY [id] LIMIT ?)"""],
+    },
+}
+
+_purge_lock = threading.Lock()
+
+
+def _purge_batch(db_id, statements, params):
+    """Ejecuta un lote en su propia transacción y retorna las filas eliminadas de Logs_Info."""
+    with get_db_connection(db_id, 'purge_logs_info') as conn:
+        cursor = conn.cursor()
+        for statement in statements:
+            cursor.execute(statement, params)
+        purged = cursor.rowcount
+        conn.commit()
+        cursor.close()
+    return max(purged, 0)
+
+
+def purge_logs_info_db(db_id, days=None, batch_size=None, mode=None):
+    """
+    Elimina (o archiva) en lotes las filas de Logs_Info más antiguas que 'days' días.
+
+    Retorna:
+      - Número de filas eliminadas de Logs_Info, o None si falla antes del primer lote.
+    """
+    days = days or LOGS_RETENTION_DAYS
+    batch_size = batch_size or LOGS_RETENTION_BATCH_SIZE
+    mode = mode or LOGS_RETENTION_MODE
+    sql = RETENTION_SQL[get_backend().name]
+    cutoff = datetime.now() - timedelta(days=days)
+    values = {'batch': batch_size, 'cutoff': cutoff}
+    params = tuple(values[name] for name in sql['params'])
+
+    purged = 0
+    try:
+        if mode == 'archive':
+            with get_db_connection(db_id, 'purge_logs_info') as conn:
+                cursor = conn.cursor()
+                cursor.execute(sql['archive_table'])
+                conn.commit()
+                cursor.close()
+
+        for _ in range(LOGS_RETENTION_MAX_BATCHES):
+            count = _purge_batch(db_id, sql[mode], params)
+            purged += count
+            if count < batch_size:
+                break
+            time.sleep(LOGS_RETENTION_PAUSE)
+    except Exception as e:
+        print(f'Error al depurar Logs_Info en {DB_CONFIG[db_id]["name"]}: {e}')
+        return purged or None
+    return purged
+
+
+def purge_logs_info():
+    """Depura Logs_Info en todas las bases y reporta las filas eliminadas por base."""
+    if not _purge_lock.acquire(blocking=False):
+        print('La depuración de Logs_Info ya está en ejecución.')
+        return None
+    try:
+        start = time.monotonic()
+        report = {}
+        for db_id in DB_CONFIG:
+            purged = purge_logs_info_db(db_id)
+            report[db_id] = purged
+            if purged:
+                message = (f'Depuración de Logs_Info ({LOGS_RETENTION_MODE}): {purged} filas con más de '
+                           f'{LOGS_RETENTION_DAYS} días en {DB_CONFIG[db_id]["name"]}')
+                print(message)
+                log_to_db(db_id, 1, 'INFO', message, 'purge_logs_info', 200)
+        print(f'Depuración de Logs_Info finalizada en {time.monotonic() - start:.1f} s: {report}')
+        return report
+    finally:
+        _purge_lock.release()
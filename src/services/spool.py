@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from services.access_record import AccessRecord
+
+# Spool local de registros DSS para cuando la base destino no responde
+SPOOL_PATH = os.getenv('SPOOL_PATH', 'spool_dahua.sqlite3')
+SPOOL_MAX_RECORDS = int(os.getenv('SPOOL_MAX_RECORDS', '500000'))   # Por destino
+SPOOL_REPLAY_BATCH = int(os.getenv('SPOOL_REPLAY_BATCH', '5000'))   # Registros por llamada a la migración
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target TEXT NOT NULL,
+    record_key TEXT NOT NULL,
+    record TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    UNIQUE (target, record_key)
+)
+"""
+
+
+class RecordSpool:
+    """
+    Cola persistente (SQLite local) de registros normalizados por destino.
+
+    Los registros se guardan una sola vez por (destino, personId, alarmTime): mientras la base
+    esté caída cada ciclo vuelve a traer las mismas horas desde DSS y no deben acumularse copias.
+    Se conserva el orden de llegada para que la regla de 30 minutos se evalúe igual al reproducir.
+    """
+
+    def __init__(self, path=SPOOL_PATH, max_records=SPOOL_MAX_RECORDS):
+        self.path = path
+        self.max_records = max_records
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(_SCHEMA)
+            self._conn.commit()
+        return self._conn
+
+    def append(self, target, page_data):
+        """Guarda los registros de una página; retorna cuántos eran nuevos en el spool."""
+        now = time.time()
+        rows = []
+        for entry in page_data:
+            record = entry.to_dict()
+            rows.append((target, f"{record['personId']}|{record['alarmTime']}", json.dumps(record), now))
+
+        with self._lock:
+            conn = self._connection()
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO spool (target, record_key, record, created_at) VALUES (?, ?, ?, ?)", rows)
+            added = conn.total_changes - before
+            # Límite por destino: se descartan los registros más antiguos
+            overflow = conn.execute("SELECT COUNT(*) FROM spool WHERE target = ?", (target,)).fetchone()[0] - self.max_records
+            if overflow > 0:
+                conn.execute("DELETE FROM spool WHERE id IN (SELECT id FROM spool WHERE target = ? ORDER BY id LIMIT ?)",
+                             (target, overflow))
+                print(f'[WARN] Spool {target} lleno: se descartaron los {overflow} registros más antiguos.')
+            conn.commit()
+        return added
+
+    def peek(self, target, limit):
+        """Retorna [(id, AccessRecord)] de los registros más antiguos del destino."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, record FROM spool WHERE target = ? ORDER BY id LIMIT ?", (target, limit)).fetchall()
+        return [(spool_id, AccessRecord.from_dict(json.loads(record))) for spool_id, record in rows]
+
+    def remove(self, ids):
+        with self._lock:
+            conn = self._connection()
+            conn.executemany("DELETE FROM spool WHERE id = ?", [(spool_id,) for spool_id in ids])
+            conn.commit()
+
+    def stats(self):
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT target, COUNT(*), MIN(created_at) FROM spool GROUP BY target").fetchall()
+        return {target: {'records': count, 'oldest': oldest} for target, count, oldest in rows}
+
+
+# Instancia global del spool
+record_spool = RecordSpool()
+
+
+def spool_page(target, page_data):
+    """Guarda la página en el spool cuando no se pudo migrar completa (base caída o filas descartadas)."""
+    try:
+        added = record_spool.append(target, page_data)
+        print(f'Página de {target} no migrada: {added} registros nuevos guardados en el spool local.')
+        return added
+    except Exception as e:
+        print(f'Error al guardar {target} en el spool local: {e}')
+        return None
+
+
+def replay_spool(target, migrate):
+    """
+    Reproduce en bloques los registros pendientes del destino con su función de migración
+    (migrate(data, spool=False)); un bloque se elimina del spool solo si la migración retorna True,
+    es decir, si todas sus filas quedaron escritas o ya existían.
+
+    Retorna:
+      - Número de registros reproducidos.
+    """
+    replayed = 0
+    try:
+        while True:
+            batch = record_spool.peek(target, SPOOL_REPLAY_BATCH)
+            if not batch:
+                break
+            page = {'data': {'pageData': [record for _, record in batch], 'totalCount': len(batch)}}
+            if migrate(page, spool=False) is not True:
+                print(f'No se pudo reproducir el spool {target}; se reintentará en el próximo ciclo.')
+                break
+            record_spool.remove([spool_id for spool_id, _ in batch])
+            replayed += len(batch)
+    except Exception as e:
+        print(f'Error al reproducir el spool {target}: {e}')
+    if replayed:
+        print(f'Spool {target}: {replayed} registros reproducidos.')
+    return replayed
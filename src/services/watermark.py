@@ -0,0 +1,123 @@
+import json
+import os
+import threading
+import time
+from utils.alarm_time import format_alarm_time, epoch_to_local
+
+# Marca de agua por tarea: último alarmTime migrado; cada ciclo pide al DSS solo desde esa marca
+WATERMARK_ENABLED = os.getenv('WATERMARK_ENABLED', '1') == '1'
+WATERMARK_PATH = os.getenv('WATERMARK_PATH', 'watermarks_dahua.json')
+WATERMARK_OVERLAP_SECONDS = int(os.getenv('WATERMARK_OVERLAP_SECONDS', '300'))        # Margen para registros que llegan tarde al DSS
+WATERMARK_MAX_LOOKBACK_HOURS = int(os.getenv('WATERMARK_MAX_LOOKBACK_HOURS', '168'))  # Límite al recuperar una caída larga
+
+
+class HighMark:
+    """Mayor alarmTime (y el id de ese registro) entre los registros observados en un ciclo."""
+
+    def __init__(self):
+        self.alarm_time = None        # Segundos UTC
+        self.record_id = None
+
+    def observe(self, record):
+        if record.alarmTime is not None and (self.alarm_time is None or record.alarmTime > self.alarm_time):
+            self.alarm_time = record.alarmTime
+            self.record_id = record.id
+        return record
+
+    def track(self, records):
+        """Envuelve un generador de registros observándolos a medida que se consumen."""
+        for record in records:
+            yield self.observe(record)
+
+
+class Watermarks:
+    """
+    Marcas de agua persistidas en un archivo JSON local: {tarea: {alarmTime, epoch, id, updated_at}}.
+
+    La marca solo avanza cuando el ciclo terminó de migrar; si el ciclo falla la siguiente
+    ejecución vuelve a pedir desde la marca anterior y la deduplicación descarta lo ya migrado.
+    """
+
+    def __init__(self, path=WATERMARK_PATH, overlap=WATERMARK_OVERLAP_SECONDS, max_lookback_hours=WATERMARK_MAX_LOOKBACK_HOURS):
+        self.path = path
+        self.overlap = overlap
+        self.max_lookback = max_lookback_hours * 3600
+        self._marks = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._marks is None:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._marks = json.load(f)
+            except FileNotFoundError:
+                self._marks = {}
+            except Exception as e:
+                print(f'[WARN] No se pudo leer {self.path}; se hará una sincronización completa: {e}')
+                self._marks = {}
+        return self._marks
+
+    def _save(self):
+        # Escritura atómica: un corte a mitad de escritura no deja el archivo corrupto
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._marks, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def get(self, job):
+        with self._lock:
+            mark = self._load().get(job)
+            return dict(mark) if mark else None
+
+    def start_time(self, job, default_start):
+        """
+        Inicio (segundos UTC) de la consulta al DSS: la marca menos el solapamiento, o default_start
+        (ventana completa) si la tarea no tiene marca.
+        """
+        mark = self.get(job)
+        if not mark:
+            return default_start
+        now = int(time.time())
+        # Una marca en el futuro (reloj del dispositivo adelantado) no debe saltarse registros
+        start = min(int(mark['epoch']), now) - self.overlap
+        return max(start, now - self.max_lookback)
+
+    def advance(self, job, high_mark):
+        """Guarda la marca del ciclo si es posterior a la vigente."""
+        if high_mark.alarm_time is None:
+            return None
+        epoch = high_mark.alarm_time
+        with self._lock:
+            marks = self._load()
+            current = marks.get(job)
+            if current and int(current['epoch']) >= epoch:
+                return current
+            marks[job] = {
+                'alarmTime': format_alarm_time(epoch_to_local(epoch)),
+                'epoch': epoch,
+                'id': high_mark.record_id,
+                'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            try:
+                self._save()
+            except Exception as e:
+                print(f'Error al guardar la marca de agua de {job}: {e}')
+            return marks[job]
+
+    def reset(self, job=None):
+        """Elimina la marca de una tarea (o de todas): el próximo ciclo consulta la ventana completa."""
+        with self._lock:
+            marks = self._load()
+            removed = [name for name in list(marks) if job is None or name == job]
+            for name in removed:
+                del marks[name]
+            self._save()
+        return removed
+
+    def snapshot(self):
+        with self._lock:
+            return {job: dict(mark) for job, mark in self._load().items()}
+
+
+# Instancia global de las marcas de agua
+watermarks = Watermarks()
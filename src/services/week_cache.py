@@ -0,0 +1,117 @@
+import asyncio
+import os
+import time
+from services.dss_async import dss_async_client
+
+# Caché en memoria de los registros de los últimos días para /obtener-registros-7-dias
+WEEK_CACHE_ENABLED = os.getenv('WEEK_CACHE_ENABLED', '1') == '1'
+WEEK_CACHE_DAYS = int(os.getenv('WEEK_CACHE_DAYS', '7'))
+WEEK_CACHE_TTL = float(os.getenv('WEEK_CACHE_TTL', '30'))              # Segundos sin volver a consultar el DSS
+WEEK_CACHE_OVERLAP = int(os.getenv('WEEK_CACHE_OVERLAP', '300'))       # Segundos que se vuelven a pedir en cada delta
+
+
+def _alarm_time_key(item):
+    return item[1].alarmTime or 0
+
+
+class WeekCache:
+    """
+    Registros de los últimos 'days' días indexados por id.
+
+    La primera consulta descarga la ventana completa; las siguientes piden al DSS solo el delta
+    desde la última actualización (menos 'overlap' segundos para los registros que llegan tarde),
+    lo agregan por id y descartan los registros que quedaron fuera de la ventana. Las consultas
+    concurrentes comparten una sola actualización.
+    """
+
+    def __init__(self, days=WEEK_CACHE_DAYS, ttl=WEEK_CACHE_TTL, overlap=WEEK_CACHE_OVERLAP):
+        self.days = days
+        self.ttl = ttl
+        self.overlap = overlap
+        self._records = {}
+        self._envelope = {}
+        self._synced_until = None     # Segundos UTC hasta donde el caché está completo
+        self._refreshed_at = float('-inf')
+        self._lock = None
+
+    def _get_lock(self):
+        # El lock se crea dentro del event loop que lo usa
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _evict(self, now):
+        cutoff = now - self.days * 86400
+        expired = [record_id for record_id, record in self._records.items()
+                   if record.alarmTime is not None and record.alarmTime < cutoff]
+        for record_id in expired:
+            del self._records[record_id]
+        return len(expired)
+
+    def _merge(self, page_data):
+        added = 0
+        for record in page_data:
+            record_id = record.identity
+            if record_id not in self._records:
+                added += 1
+            self._records[record_id] = record
+        return added
+
+    async def refresh(self, force=False):
+        """Actualiza el caché si venció el TTL; retorna el error del DSS si no hay datos que servir."""
+        async with self._get_lock():
+            if not force and time.monotonic() - self._refreshed_at < self.ttl:
+                return None
+
+            now = int(time.time())
+            full = force or self._synced_until is None
+            startTime = now - self.days * 86400 if full else self._synced_until - self.overlap
+            endTime = now + 3600
+
+            # El rango se consulta por ventanas en paralelo con el cliente asíncrono del DSS (mismo event loop)
+            result = await dss_async_client.fetch_records_range(startTime, endTime, keep_raw=True)
+            if not result or "error" in result:
+                if full and self._synced_until is None:
+                    return result or {"error": "No se pudo obtener la ventana de registros"}
+                # Se sirve el caché anterior y se reintenta en la próxima consulta
+                print(f'No se pudo actualizar el caché de {self.days} días; se responde con los datos anteriores: {result}')
+                return None
+
+            if full:
+                self._records.clear()
+            added = self._merge(result["data"]["pageData"])
+            evicted = self._evict(now)
+            if added:
+                # Se ordena al actualizar (no en cada consulta); el delta puede traer registros atrasados
+                self._records = dict(sorted(self._records.items(), key=_alarm_time_key))
+            self._envelope = {key: value for key, value in result.items() if key != "data"}
+            # Si faltaron ventanas el delta se vuelve a pedir desde la misma marca
+            if not result["data"].get("missingWindows"):
+                self._synced_until = now
+            self._refreshed_at = time.monotonic()
+            print(f'Caché de {self.days} días actualizado ({"completo" if full else "delta"}): '
+                  f'{added} nuevos, {evicted} descartados, {len(self._records)} en total.')
+            return None
+
+    async def get(self, force=False):
+        """Retorna los registros (AccessRecord) con el formato de fetch_all_access_control_records."""
+        error = await self.refresh(force)
+        if error:
+            return error
+        page_data = list(self._records.values())
+        return {**self._envelope, "data": {"pageData": page_data, "totalCount": len(page_data)}}
+
+    def invalidate(self):
+        self._synced_until = None
+        self._refreshed_at = float('-inf')
+
+    def stats(self):
+        return {
+            'records': len(self._records),
+            'synced_until': self._synced_until,
+            'age': None if self._synced_until is None else round(time.monotonic() - self._refreshed_at, 1),
+        }
+
+
+# Instancia global del caché semanal
+week_cache = WeekCache()
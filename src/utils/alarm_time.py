@@ -0,0 +1,39 @@
+from datetime import datetime, timedelta
+
+# Formato de alarmTime en las respuestas de la API
+ALARM_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# El DSS entrega alarmTime en segundos UTC; se guarda en hora de Ecuador (UTC-5, sin horario de verano)
+ALARM_TIME_OFFSET = timedelta(hours=-5)
+_EPOCH_LOCAL = datetime(1970, 1, 1) + ALARM_TIME_OFFSET
+
+
+def epoch_to_local(seconds):
+    """Segundos UTC -> datetime local (sin zona) con una sola suma, sin conversión de zona por registro."""
+    return _EPOCH_LOCAL + timedelta(seconds=int(seconds))
+
+
+def to_alarm_datetime(value):
+    """
+    Normaliza alarmTime a datetime local. Acepta datetime, segundos UTC (int o texto numérico)
+    o texto con ALARM_TIME_FORMAT (spool y registros anteriores). Retorna None si no hay valor.
+    """
+    if value is None or isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        if value.isdigit():
+            return epoch_to_local(value)
+        return datetime.strptime(value, ALARM_TIME_FORMAT)
+    return epoch_to_local(value)
+
+
+def format_alarm_time(value):
+    """datetime -> texto con ALARM_TIME_FORMAT (solo al responder en la API)."""
+    if isinstance(value, datetime):
+        return value.strftime(ALARM_TIME_FORMAT)
+    return value
+
+
+def local_to_epoch(value):
+    """datetime local (o cualquier valor aceptado por to_alarm_datetime) -> segundos UTC."""
+    return int((to_alarm_datetime(value) - _EPOCH_LOCAL).total_seconds())
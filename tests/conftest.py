@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Las pruebas usan el motor SQLite en una carpeta temporal; las variables se definen antes de importar
+# los módulos de src porque leen su configuración al importarse
+_TMP_DIR = tempfile.mkdtemp(prefix='dahua_tests_')
+os.environ['DB_BACKEND'] = 'sqlite'
+os.environ['DB_SQLITE_PATH'] = os.path.join(_TMP_DIR, 'dahua_{db_id}.sqlite3')
+os.environ['SPOOL_PATH'] = os.path.join(_TMP_DIR, 'spool_dahua.sqlite3')
+os.environ['WATERMARK_PATH'] = os.path.join(_TMP_DIR, 'watermarks_dahua.json')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+TABLES = {
+    1: ['acc_monitor_log', 'acc_monitor_log_sj', 'Parametros_Sistema', 'Logs_Info'],
+    2: ['iclock_transaction', 'iclock_transaction_sj', 'personnel_employee', 'iclock_terminal'],
+}
+
+
+@pytest.fixture
+def db():
+    """Módulo database.db con las tablas de ambas bases vacías."""
+    from database import db as db_module
+    for db_id, tables in TABLES.items():
+        with db_module.get_db_connection(db_id) as conn:
+            cursor = conn.cursor()
+            for table in tables:
+                cursor.execute(f'DELETE FROM {table}')
+            conn.commit()
+            cursor.close()
+    return db_module
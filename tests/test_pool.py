@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from database.pool import ConnectionPool
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def cursor(self):
+        raise AssertionError('La conexión no debería validarse en esta prueba')
+
+
+class FakeConnector:
+    def __init__(self):
+        self.opened = []
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        conn = FakeConnection()
+        with self._lock:
+            self.opened.append(conn)
+        return conn
+
+
+def test_released_connection_is_reused():
+    connect = FakeConnector()
+    pool = ConnectionPool(connect, min_size=0, max_size=2, validate_after=60)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(connect.opened) == 1
+
+
+def test_idle_connections_are_evicted_after_idle_timeout():
+    connect = FakeConnector()
+    pool = ConnectionPool(connect, min_size=0, max_size=2, idle_timeout=0.05, validate_after=60)
+    first = pool.acquire()
+    pool.release(first)
+    time.sleep(0.1)
+    second = pool.acquire()
+    assert second is not first
+    assert first.closed
+    assert pool.stats() == {'in_use': 1, 'idle': 0, 'max_size': 2}
+
+
+def test_min_size_connections_survive_idle_timeout():
+    connect = FakeConnector()
+    pool = ConnectionPool(connect, min_size=1, max_size=2, idle_timeout=0.05, validate_after=60)
+    pool.fill()
+    time.sleep(0.1)
+    conn = pool.acquire()
+    assert conn is connect.opened[0]
+    assert not conn.closed
+
+
+def test_acquire_times_out_when_pool_is_exhausted():
+    pool = ConnectionPool(FakeConnector(), min_size=0, max_size=1, acquire_timeout=0.1)
+    pool.acquire()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    assert time.monotonic() - start >= 0.1
+
+
+def test_waiting_acquire_gets_released_connection():
+    pool = ConnectionPool(FakeConnector(), min_size=0, max_size=1, acquire_timeout=2, validate_after=60)
+    conn = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(conn,)).start()
+    assert pool.acquire() is conn
+
+
+def test_broken_connection_is_closed_and_not_reused():
+    connect = FakeConnector()
+    pool = ConnectionPool(connect, min_size=0, max_size=1, validate_after=60)
+    conn = pool.acquire()
+    pool.release(conn, broken=True)
+    assert conn.closed
+    assert pool.acquire() is not conn
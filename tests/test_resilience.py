@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from services.resilience import CircuitBreaker, CircuitOpenError, backoff_delay
+
+
+@pytest.fixture
+def breaker():
+    return CircuitBreaker('prueba', threshold=2, cooldown=0.05)
+
+
+def _open(breaker):
+    for _ in range(breaker.threshold):
+        breaker.check()
+        breaker.record_failure('falla')
+
+
+def test_opens_after_threshold_consecutive_failures(breaker):
+    breaker.record_failure('falla')
+    assert breaker.state == 'closed'
+    breaker.record_failure('falla')
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    assert breaker.rejected == 1
+    assert 0 < breaker.remaining() <= 0.05
+
+
+def test_success_resets_failure_count(breaker):
+    breaker.record_failure('falla')
+    breaker.record_success()
+    breaker.record_failure('falla')
+    assert breaker.state == 'closed'
+
+
+def test_half_open_allows_a_single_probe(breaker):
+    _open(breaker)
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == 'half_open'
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_failed_probe_reopens_circuit(breaker):
+    _open(breaker)
+    time.sleep(0.06)
+    breaker.check()
+    breaker.record_failure('falla')
+    assert breaker.state == 'open'
+    assert breaker.opened_count == 2
+
+
+def test_released_probe_allows_another_probe(breaker):
+    _open(breaker)
+    time.sleep(0.06)
+    breaker.check()
+    # Mientras la prueba está en curso se informa la espera (el scheduler no reintenta en bucle)
+    assert breaker.remaining() > 0
+    breaker.release_probe()
+    assert breaker.remaining() == 0
+    assert breaker.allow()
+
+
+def test_lost_probe_expires_after_cooldown(breaker):
+    _open(breaker)
+    time.sleep(0.06)
+    breaker.check()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_on_open_is_notified_once(breaker):
+    messages = []
+    breaker.on_open = messages.append
+    _open(breaker)
+    time.sleep(0.06)
+    breaker.check()
+    breaker.record_failure('falla')
+    assert len(messages) == 1
+
+
+def test_backoff_delay_is_bounded():
+    for attempt in range(1, 10):
+        assert 0 <= backoff_delay(attempt, base=0.5, max_delay=4) <= min(4, 0.5 * 2 ** (attempt - 1))
@@ -0,0 +1,86 @@
+import pytest
+
+from services import spool
+from services.access_record import AccessRecord
+from services.spool import RecordSpool, replay_spool
+
+
+def _records(count, start=0):
+    return [AccessRecord(str(i), str(100 + i), 'Empleado', 'B_Comedor_MH_Door1', 1_700_000_000 + i * 60)
+            for i in range(start, start + count)]
+
+
+@pytest.fixture
+def record_spool(tmp_path, monkeypatch):
+    instance = RecordSpool(path=str(tmp_path / 'spool.sqlite3'), max_records=100)
+    monkeypatch.setattr(spool, 'record_spool', instance)
+    return instance
+
+
+def test_append_stores_each_record_once(record_spool):
+    assert record_spool.append('iclock', _records(5)) == 5
+    # Mientras la base esté caída cada ciclo vuelve a traer las mismas horas
+    assert record_spool.append('iclock', _records(5)) == 0
+    assert record_spool.append('acc_monitor_log', _records(5)) == 5
+    assert record_spool.stats()['iclock']['records'] == 5
+
+
+def test_peek_returns_records_in_arrival_order(record_spool):
+    records = _records(3)
+    record_spool.append('iclock', records)
+    peeked = [record for _, record in record_spool.peek('iclock', 10)]
+    assert [record.id for record in peeked] == ['0', '1', '2']
+    assert [record.alarmTime for record in peeked] == [record.alarmTime for record in records]
+    assert peeked[0].punch_time == records[0].punch_time
+
+
+def test_append_drops_oldest_records_when_full(record_spool):
+    record_spool.append('iclock', _records(120))
+    ids = [record.id for _, record in record_spool.peek('iclock', 200)]
+    assert len(ids) == 100
+    assert ids[0] == '20'
+
+
+def test_replay_removes_batches_that_migrated(record_spool, monkeypatch):
+    monkeypatch.setattr(spool, 'SPOOL_REPLAY_BATCH', 4)
+    record_spool.append('iclock', _records(10))
+    pages = []
+
+    def migrate(page, spool):
+        assert spool is False
+        pages.append(len(page['data']['pageData']))
+        return True
+
+    assert replay_spool('iclock', migrate) == 10
+    assert pages == [4, 4, 2]
+    assert record_spool.stats() == {}
+
+
+def test_replay_keeps_batch_that_did_not_migrate(record_spool, monkeypatch):
+    monkeypatch.setattr(spool, 'SPOOL_REPLAY_BATCH', 4)
+    record_spool.append('iclock', _records(10))
+    results = iter([True, None])
+
+    assert replay_spool('iclock', lambda page, spool: next(results)) == 4
+    # El bloque que falló y los siguientes se reproducen en el próximo ciclo
+    assert record_spool.stats()['iclock']['records'] == 6
+
+
+def test_page_is_spooled_when_database_is_down(record_spool, monkeypatch):
+    from services import migrate_db
+    monkeypatch.setattr(migrate_db, 'ping_db', lambda db_id: False)
+    page = {'data': {'pageData': _records(5), 'totalCount': 5}}
+    assert migrate_db.migrate_db_acc_manager_log(page) == migrate_db.SPOOLED
+    assert record_spool.stats()['acc_monitor_log']['records'] == 5
+
+
+def test_page_that_could_not_be_spooled_is_not_completed(record_spool, monkeypatch):
+    from services import migrate_db
+
+    def fail(target, page_data):
+        raise OSError('disco lleno')
+
+    monkeypatch.setattr(migrate_db, 'ping_db', lambda db_id: False)
+    monkeypatch.setattr(record_spool, 'append', fail)
+    page = {'data': {'pageData': _records(5), 'totalCount': 5}}
+    assert migrate_db.migrate_db_acc_manager_log(page) is None
@@ -0,0 +1,68 @@
+import random
+from datetime import timedelta
+
+import pytest
+
+from services import migrate_db
+from services.access_record import AccessRecord
+from utils.alarm_time import local_to_epoch
+
+TARGETS = {
+    # destino: (migración, db_id, tabla, columna pin, columna time, pointName aceptado)
+    'iclock': (migrate_db.migrate_db_iclock, 2, 'iclock_transaction', 'emp_code', 'punch_time', 'B_Sistemas_Tics_Door1'),
+    'acc_monitor_log': (migrate_db.migrate_db_acc_manager_log, 1, 'acc_monitor_log', 'pin', 'time', 'B_Comedor_MH_Door1'),
+}
+
+
+def _build_page(point_name, now):
+    """Página con registros de las últimas 3 horas, claves repetidas y varios registros por pin."""
+    rng = random.Random(7)
+    page = []
+    for i in range(300):
+        alarm_time = (now - timedelta(seconds=rng.randrange(3 * 3600))).replace(microsecond=0)
+        page.append(AccessRecord(str(i), str(100 + rng.randrange(20)), 'Empleado', point_name, local_to_epoch(alarm_time)))
+    page.extend(AccessRecord(f'dup-{record.id}', record.personId, 'Empleado', point_name, record.alarmTime)
+                for record in page[:20])
+    page.sort(key=lambda record: record.alarmTime)
+    return {'data': {'pageData': page, 'totalCount': len(page)}}
+
+
+def _seed(db, db_id, table, pin, time, page, now):
+    """Registros previos: algunos duplican claves de la página, otros activan la regla de 30 minutos."""
+    rows = sorted({(record.personId, record.punch_time) for record in page['data']['pageData'][40:60]})[:10]
+    rows += [('100', now - timedelta(minutes=10)), ('101', now - timedelta(hours=5)), ('102', now - timedelta(minutes=29))]
+    with db.get_db_connection(db_id) as conn:
+        cursor = conn.cursor()
+        cursor.executemany(f'INSERT INTO {table} ({pin}, {time}) VALUES (?, ?)', rows)
+        conn.commit()
+        cursor.close()
+    return set(rows)
+
+
+def _migrate(db, target, mode, monkeypatch):
+    migrate, db_id, table, pin, time, point_name = TARGETS[target]
+    now = migrate_db.get_upload_time().replace(microsecond=0)
+    page = _build_page(point_name, now)
+    with db.get_db_connection(db_id) as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'DELETE FROM {table}')
+        conn.commit()
+        cursor.close()
+    seeded = _seed(db, db_id, table, pin, time, page, now)
+    monkeypatch.setattr(migrate_db, 'MIGRATION_MODE', mode)
+    # La regla de 30 minutos se evalúa con la misma hora de carga en ambos modos
+    monkeypatch.setattr(migrate_db, 'get_upload_time', lambda: now)
+    assert migrate(page, spool=False) is True
+    rows = db.execute_select_tuple_query(db_id, f'SELECT {pin}, {time} FROM {table} ORDER BY {pin}, {time}', ())
+    return seeded, [(str(pin_value), time_value) for pin_value, time_value in rows]
+
+
+@pytest.mark.parametrize('target', sorted(TARGETS))
+def test_staging_matches_row_mode(db, target, monkeypatch):
+    seeded, row_result = _migrate(db, target, 'row', monkeypatch)
+    _, staging_result = _migrate(db, target, 'staging', monkeypatch)
+    assert staging_result == row_result
+    # Se insertaron filas de la página sin repetir claves
+    assert len(set(row_result)) == len(row_result) > len(seeded)
+    # El pin con un registro previo dentro de los últimos 30 minutos no recibe filas nuevas
+    assert {row for row in row_result if row[0] == '100'} == {row for row in seeded if row[0] == '100'}
@@ -0,0 +1,55 @@
+import sqlite3
+
+from database.backends import _SqliteConnection
+from database.unit_of_work import UnitOfWork
+
+INSERT = 'INSERT INTO marks (pin, time) VALUES (?, ?)'
+
+
+def _connection():
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE marks (pin TEXT, time TEXT, UNIQUE (pin, time))')
+    return _SqliteConnection(conn)
+
+
+def _count(conn):
+    cursor = conn.cursor()
+    count = cursor.execute('SELECT COUNT(*) FROM marks').fetchone()[0]
+    cursor.close()
+    return count
+
+
+def test_flush_applies_all_rows_in_one_batch():
+    conn = _connection()
+    uow = UnitOfWork(conn)
+    for i in range(5):
+        uow.add(INSERT, (str(i), '2025-01-01 08:00:00'))
+    assert uow.flush() == 5
+    assert uow.applied == 5
+    assert uow.complete
+    assert _count(conn) == 5
+
+
+def test_failed_batch_is_retried_row_by_row():
+    conn = _connection()
+    uow = UnitOfWork(conn)
+    committed = []
+    rows = [('1', 't1'), ('2', 't1'), ('1', 't1'), ('3', 't1')]   # La tercera fila viola la clave única
+    for row in rows:
+        uow.add(INSERT, row, on_commit=lambda row=row: committed.append(row))
+    assert uow.flush() == 3
+    assert uow.applied == 3
+    assert uow.failed == 1
+    assert not uow.complete
+    assert _count(conn) == 3
+    # on_commit solo se invoca para las sentencias confirmadas
+    assert committed == [('1', 't1'), ('2', 't1'), ('3', 't1')]
+
+
+def test_add_flushes_when_batch_size_is_reached():
+    conn = _connection()
+    uow = UnitOfWork(conn, batch_size=2)
+    assert uow.add(INSERT, ('1', 't1')) == 0
+    assert uow.add(INSERT, ('2', 't1')) == 2
+    assert _count(conn) == 2
+    assert uow.flush() == 0
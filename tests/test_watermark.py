@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from services.access_record import AccessRecord
+from services.watermark import HighMark, Watermarks
+
+
+@pytest.fixture
+def watermarks(tmp_path):
+    return Watermarks(path=str(tmp_path / 'watermarks.json'), overlap=300, max_lookback_hours=24)
+
+
+def _high_mark(*alarm_times):
+    high_mark = HighMark()
+    for i, alarm_time in enumerate(alarm_times):
+        high_mark.observe(AccessRecord(str(i), '100', 'Empleado', 'B_Comedor_MH_Door1', alarm_time))
+    return high_mark
+
+
+def test_high_mark_keeps_latest_alarm_time():
+    high_mark = _high_mark(100, 300, None, 200)
+    assert high_mark.alarm_time == 300
+    assert high_mark.record_id == '1'
+
+
+def test_start_time_without_mark_is_default(watermarks):
+    assert watermarks.start_time('iclock', 12345) == 12345
+
+
+def test_start_time_subtracts_overlap(watermarks):
+    epoch = int(time.time()) - 3600
+    watermarks.advance('iclock', _high_mark(epoch))
+    assert watermarks.start_time('iclock', 0) == epoch - 300
+
+
+def test_start_time_is_limited_by_max_lookback(watermarks):
+    now = int(time.time())
+    watermarks.advance('iclock', _high_mark(now - 48 * 3600))
+    assert now - 24 * 3600 <= watermarks.start_time('iclock', 0) <= int(time.time()) - 24 * 3600
+
+
+def test_future_mark_does_not_skip_records(watermarks):
+    now = int(time.time())
+    watermarks.advance('iclock', _high_mark(now + 3600))
+    assert watermarks.start_time('iclock', 0) <= int(time.time()) - 300
+
+
+def test_advance_never_moves_backwards(watermarks):
+    epoch = int(time.time()) - 600
+    watermarks.advance('iclock', _high_mark(epoch))
+    watermarks.advance('iclock', _high_mark(epoch - 100))
+    assert watermarks.get('iclock')['epoch'] == epoch
+    assert watermarks.advance('iclock', HighMark()) is None
+
+
+def test_marks_are_persisted_and_reset(watermarks, tmp_path):
+    epoch = int(time.time()) - 600
+    watermarks.advance('iclock', _high_mark(epoch))
+    reloaded = Watermarks(path=str(tmp_path / 'watermarks.json'))
+    assert reloaded.get('iclock')['epoch'] == epoch
+    assert reloaded.reset('iclock') == ['iclock']
+    assert reloaded.start_time('iclock', 42) == 42